@@ -5,11 +5,11 @@ import uvicorn
 from streamlit_local_storage import LocalStorage
 from src.api import api_app, SHARED_STATE
 from src import ui_components, blockchain_utils
-from src.config import CONTRACT_ABI, CONTRACT_JSON_PATH
+from src.config import CONTRACT_ABI, CONTRACT_JSON_PATH, API_HOST, API_PORT, EMBEDDED_API
 
 def run_api():
     """Ejecuta el servidor Uvicorn en un hilo."""
-    uvicorn.run(api_app, host="0.0.0.0", port=8000, log_level="info")
+    uvicorn.run(api_app, host=API_HOST, port=API_PORT, log_level="info")
 
 def main():
     """Función principal de la aplicación Streamlit."""
@@ -24,12 +24,12 @@ def main():
         st.stop()
     
     # inicia el hilo de la API si no se ha iniciado aún
-    if 'api_thread_started' not in st.session_state:
+    if EMBEDDED_API and 'api_thread_started' not in st.session_state:
         st.session_state.api_thread_started = True
         # se usa un 'daemon thread' para que se cierre automáticamente cuando la app principal se detenga
         api_thread = threading.Thread(target=run_api, daemon=True)
         api_thread.start()
-        st.toast("Servicio de API iniciado en http://localhost:8000", icon="🚀")
+        st.toast(f"Servicio de API iniciado en http://localhost:{API_PORT}", icon="🚀")
 
     if 'initialized' not in st.session_state:
         st.session_state.initialized = True
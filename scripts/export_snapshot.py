@@ -0,0 +1,61 @@
+import os
+import sys
+import time
+
+# permite importar los módulos de `src` al ejecutar el script desde cualquier directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import blockchain_utils, bootstrap, snapshot
+
+# ==============================================================================
+# PARÁMETROS DE CONFIGURACIÓN
+# ==============================================================================
+# Edita estos valores para adaptar el script a tu entorno.
+
+# URL del nodo RPC y dirección del contrato WalletDataCache con las métricas cacheadas
+RPC_URL = 'http://127.0.0.1:7545/'
+CONTRACT_ADDRESS = '0xDireccionDelContrato'
+
+# Archivo Parquet de salida
+OUTPUT_PATH = 'wallet_metrics.parquet'
+
+# Checkpoint de los eventos del contrato ya leídos, para que las siguientes
+# exportaciones solo lean los eventos nuevos (el mismo formato que usa la API).
+CHECKPOINT_PATH = 'cache_checkpoint.json'
+
+# ==============================================================================
+# FUNCIONES DEL SCRIPT
+# ==============================================================================
+
+def main():
+    """Función principal: carga las wallets del contrato y las exporta a Parquet."""
+    print(f"Conectando a {RPC_URL}...")
+    w3 = blockchain_utils.connect_to_node(RPC_URL)
+    if not w3:
+        print(f"Error: No se pudo conectar al nodo en {RPC_URL}.")
+        sys.exit(1)
+
+    contract = blockchain_utils.get_contract_instance(w3, CONTRACT_ADDRESS)
+    if not contract:
+        print(f"Error: No se pudo instanciar el contrato en {CONTRACT_ADDRESS}.")
+        sys.exit(1)
+
+    # 1. Leer las wallets cacheadas en el contrato a partir de sus eventos (sin analizar nada)
+    start = time.perf_counter()
+    total = bootstrap.bootstrap_wallet_cache(w3, contract, CHECKPOINT_PATH)
+    print(f"{total} wallets leídas del contrato en {time.perf_counter() - start:.1f} s.")
+
+    # 2. Escribir el snapshot por grupos de filas, con la reputación a fecha del último bloque
+    head = w3.eth.get_block("latest")
+    try:
+        written = snapshot.export_snapshot(OUTPUT_PATH, snapshot.iter_cached_wallets(), head.timestamp, head.number)
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    print(f"Snapshot con {written} wallets guardado en {OUTPUT_PATH} (bloque {head.number}).")
+
+    print("\n--- Exportación finalizada ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,8 @@
 import sys
 import time
 import random
+import threading
+from eth_account import Account
 from web3 import Web3
 
 # ==============================================================================
@@ -27,6 +29,48 @@ MAX_ETH_VALUE = 0.5
 MIN_DELAY_BETWEEN_TXS_S = 0.1  # 100 milisegundos
 MAX_DELAY_BETWEEN_TXS_S = 0.5  # 500 milisegundos
 
+# Modo de generación:
+#   'simple': una transferencia de ETH cada vez desde las cuentas desbloqueadas del nodo, con pausas.
+#   'fast':   fixtures grandes para benchmarks. Cuentas propias derivadas de FAST_SEED, transacciones
+#             firmadas localmente y enviadas por lotes, un hilo por cuenta emisora y sin pausas. Mezcla
+#             transferencias de ETH, tokens ERC-20 y ERC-721, creación de contratos y transacciones
+#             fallidas, para cubrir todas las métricas del análisis.
+MODE = 'simple'
+
+# --- Parámetros del modo 'fast' (TOTAL_TRANSACTIONS indica cuántas generar) ---
+
+# Usa una EVM en memoria (eth-tester) en lugar de RPC_URL. Necesita `pip install "eth-tester[py-evm]"`
+# y es mucho más lenta que un nodo como Anvil o Hardhat, así que solo sirve para fixtures pequeñas.
+FAST_IN_PROCESS_EVM = False
+
+# Cuentas emisoras (una por hilo) y semilla de la que se derivan sus claves privadas.
+# Con la misma semilla las cuentas son siempre las mismas, así que se pueden analizar después.
+FAST_SENDER_ACCOUNTS = 20
+FAST_SEED = 'blockchain-reputation-fixtures'
+
+# ETH que recibe cada cuenta emisora de la primera cuenta del nodo antes de empezar.
+FAST_FUNDING_ETH = 1000
+
+# Transacciones firmadas por petición JSON-RPC por lotes.
+FAST_BATCH_SIZE = 200
+
+# Número de contratos de cada tipo de token que se despliegan y usan.
+FAST_ERC20_TOKENS = 5
+FAST_NFT_COLLECTIONS = 3
+
+# Proporción de cada tipo de transacción en la mezcla.
+FAST_TX_MIX = {
+    'eth': 0.60,       # transferencia de ETH entre cuentas emisoras
+    'erc20': 0.15,     # Transfer de un token ERC-20
+    'nft': 0.10,       # Transfer de un NFT (ERC-721)
+    'create': 0.05,    # despliegue de un contrato
+    'fail': 0.10,      # llamada a un contrato que revierte
+}
+
+# Días a los que se reparten las transacciones (para activeDaysCount). Entre día y día se adelanta
+# el reloj del nodo con evm_increaseTime (Hardhat, Anvil, Ganache) o el timeTravel de eth-tester.
+FAST_DAYS_TO_SPAN = 1
+
 # ==============================================================================
 # FUNCIONES DEL SCRIPT
 # ==============================================================================
@@ -99,8 +143,231 @@ def generate_transactions(w3: Web3, accounts: list[str], total_txs: int):
         delay = random.uniform(MIN_DELAY_BETWEEN_TXS_S, MAX_DELAY_BETWEEN_TXS_S)
         time.sleep(delay)
 
+# ==============================================================================
+# MODO 'fast'
+# ==============================================================================
+
+TRANSFER_TOPIC = Web3.keccak(text="Transfer(address,address,uint256)")
+
+# Contratos mínimos para las fixtures, ensamblados a mano para no depender de un compilador.
+# Solo emiten los eventos que lee el análisis; no llevan balances ni propietarios.
+
+# ERC-20: cualquier llamada transfer(to, amount) emite Transfer(msg.sender, to, amount).
+#   PUSH1 0x24 CALLDATALOAD PUSH1 0 MSTORE          memoria[0] = amount
+#   PUSH1 0x04 CALLDATALOAD CALLER PUSH32 <Transfer> topics: Transfer, msg.sender, to
+#   PUSH1 0x20 PUSH1 0 LOG3 STOP
+ERC20_RUNTIME = "602435600052600435337f" + TRANSFER_TOPIC.hex() + "60206000a300"
+
+# ERC-721: supportsInterface(bytes4) devuelve true (lo que consulta el análisis vía ERC-165);
+# cualquier otra llamada transferFrom-like (to, tokenId) emite Transfer(msg.sender, to, tokenId).
+#   PUSH1 0 CALLDATALOAD PUSH1 0xe0 SHR PUSH4 0x01ffc9a7 EQ PUSH1 0x3d JUMPI   selector
+#   PUSH1 0x24 CALLDATALOAD PUSH1 0x04 CALLDATALOAD CALLER PUSH32 <Transfer>  topics
+#   PUSH1 0 PUSH1 0 LOG4 STOP
+#   JUMPDEST PUSH1 1 PUSH1 0 MSTORE PUSH1 0x20 PUSH1 0 RETURN                 0x3d: devuelve true
+ERC721_RUNTIME = (
+    "60003560e01c6301ffc9a714603d57"
+    "602435600435337f" + TRANSFER_TOPIC.hex() + "60006000a400"
+    "5b600160005260206000f3"
+)
+
+# Contrato que revierte siempre: PUSH1 0 DUP1 REVERT
+REVERT_RUNTIME = "600080fd"
+
+# Selectores de las llamadas (el cuerpo de los contratos no los comprueba, salvo supportsInterface)
+ERC20_TRANSFER_SELECTOR = "a9059cbb"     # transfer(address,uint256)
+ERC721_TRANSFER_SELECTOR = "42842e0e"    # safeTransferFrom(address,address,uint256), con (to, tokenId)
+
+# Gas fijo por tipo de transacción, para no estimar cada una
+FAST_GAS_LIMITS = {'eth': 21_000, 'erc20': 60_000, 'nft': 60_000, 'create': 120_000, 'fail': 40_000}
+
+
+def deploy_code(runtime_hex: str) -> str:
+    """Código de despliegue que copia `runtime_hex` a memoria y lo devuelve como código del contrato."""
+    size = len(runtime_hex) // 2
+    # PUSH1 size DUP1 PUSH1 0x0b PUSH1 0 CODECOPY PUSH1 0 RETURN, seguido del runtime
+    return "0x60" + f"{size:02x}" + "80600b6000396000f3" + runtime_hex
+
+
+def setup_fast_web3() -> Web3:
+    """Conecta con el nodo de RPC_URL o levanta la EVM en memoria."""
+    if not FAST_IN_PROCESS_EVM:
+        return setup_web3(RPC_URL)
+    try:
+        w3 = Web3(Web3.EthereumTesterProvider())
+    except Exception as e:
+        print(f"Error: No se pudo iniciar la EVM en memoria ({e}).")
+        print('Instálala con: pip install "eth-tester[py-evm]"')
+        sys.exit(1)
+    print("Usando una EVM en memoria (eth-tester).")
+    return w3
+
+
+def derive_accounts(seed: str, count: int) -> list:
+    """Deriva `count` cuentas deterministas a partir de la semilla."""
+    return [Account.from_key(Web3.keccak(text=f"{seed}-{i}")) for i in range(count)]
+
+
+def fund_accounts(w3: Web3, funder: str, accounts: list, eth_amount: float):
+    """Envía ETH desde una cuenta desbloqueada del nodo a cada cuenta emisora."""
+    print(f"Fondeando {len(accounts)} cuentas con {eth_amount} ETH cada una desde {funder}...")
+    tx_hash = None
+    for account in accounts:
+        tx_hash = w3.eth.send_transaction({'from': funder, 'to': account.address, 'value': w3.to_wei(eth_amount, 'ether')})
+    w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300)
+
+
+def deploy_fixture_contracts(w3: Web3, deployer: str) -> dict:
+    """Despliega los tokens ERC-20, las colecciones ERC-721 y el contrato que revierte."""
+    plan = [('erc20', ERC20_RUNTIME)] * FAST_ERC20_TOKENS + [('nft', ERC721_RUNTIME)] * FAST_NFT_COLLECTIONS
+    plan.append(('fail', REVERT_RUNTIME))
+
+    hashes = [(kind, w3.eth.send_transaction({'from': deployer, 'data': deploy_code(runtime)})) for kind, runtime in plan]
+    contracts = {'erc20': [], 'nft': [], 'fail': []}
+    for kind, tx_hash in hashes:
+        contracts[kind].append(w3.eth.wait_for_transaction_receipt(tx_hash, timeout=300).contractAddress)
+    print(f"Contratos de prueba desplegados: {len(contracts['erc20'])} ERC-20, {len(contracts['nft'])} ERC-721 y 1 que revierte.")
+    return contracts
+
+
+def build_fast_tx(kind: str, sender, receivers: list[str], contracts: dict, nonce: int, gas_price: int, chain_id: int) -> dict:
+    """Construye una transacción del tipo indicado, lista para firmar."""
+    tx = {'nonce': nonce, 'gas': FAST_GAS_LIMITS[kind], 'gasPrice': gas_price, 'chainId': chain_id, 'value': 0, 'data': '0x'}
+    receiver = random.choice(receivers)
+    while receiver == sender.address:
+        receiver = random.choice(receivers)
+    padded_receiver = receiver[2:].lower().rjust(64, '0')
+
+    if kind == 'eth':
+        tx.update(to=receiver, value=random.randint(1, 10**15))
+    elif kind == 'erc20':
+        tx.update(to=random.choice(contracts['erc20']), data=f"0x{ERC20_TRANSFER_SELECTOR}{padded_receiver}{random.randint(1, 10**21):064x}")
+    elif kind == 'nft':
+        tx.update(to=random.choice(contracts['nft']), data=f"0x{ERC721_TRANSFER_SELECTOR}{padded_receiver}{random.getrandbits(64):064x}")
+    elif kind == 'create':
+        tx.update(data=deploy_code(ERC20_RUNTIME))
+    else:
+        tx.update(to=contracts['fail'][0])
+    return tx
+
+
+def send_raw_batch(w3: Web3, raw_txs: list[str]) -> int:
+    """Envía transacciones firmadas en una petición JSON-RPC por lotes; devuelve cuántas rechazó el nodo."""
+    if FAST_IN_PROCESS_EVM:
+        errors = 0
+        for raw in raw_txs:
+            try:
+                w3.eth.send_raw_transaction(raw)
+            except Exception:
+                errors += 1
+        return errors
+
+    responses = w3.provider.make_batch_request([("eth_sendRawTransaction", [raw]) for raw in raw_txs])
+    if not isinstance(responses, list):
+        # el nodo respondió con un único error para todo el lote
+        return len(raw_txs)
+    return sum(1 for response in responses if "error" in response)
+
+
+def run_sender(w3: Web3, sender, receivers, contracts, count: int, gas_price: int, chain_id: int, stats: dict, lock):
+    """Hilo de una cuenta emisora: firma y envía `count` transacciones por lotes con nonces locales."""
+    kinds, weights = list(FAST_TX_MIX), list(FAST_TX_MIX.values())
+    nonce = w3.eth.get_transaction_count(sender.address, 'pending')
+    sent = 0
+    while sent < count:
+        batch = []
+        for _ in range(min(FAST_BATCH_SIZE, count - sent)):
+            tx = build_fast_tx(random.choices(kinds, weights)[0], sender, receivers, contracts, nonce, gas_price, chain_id)
+            batch.append("0x" + sender.sign_transaction(tx).raw_transaction.hex())
+            nonce += 1
+
+        errors = send_raw_batch(w3, batch)
+        if errors:
+            # un rechazo deja un hueco en los nonces: se vuelve a leer el nonce del nodo
+            nonce = w3.eth.get_transaction_count(sender.address, 'pending')
+        sent += len(batch)
+        with lock:
+            stats['sent'] += len(batch) - errors
+            stats['errors'] += errors
+
+
+def advance_one_day(w3: Web3) -> bool:
+    """Adelanta el reloj del nodo un día y mina un bloque. Devuelve False si el nodo no lo admite."""
+    try:
+        if FAST_IN_PROCESS_EVM:
+            w3.provider.ethereum_tester.time_travel(w3.eth.get_block('latest').timestamp + 24 * 3600)
+            w3.provider.ethereum_tester.mine_blocks()
+        else:
+            for method, params in (("evm_increaseTime", [24 * 3600]), ("evm_mine", [])):
+                response = w3.provider.make_request(method, params)
+                if "error" in response:
+                    raise RuntimeError(response["error"].get("message", response["error"]))
+        return True
+    except Exception as e:
+        print(f"Advertencia: el nodo no permite adelantar el reloj ({e}); todo quedará en el mismo día.")
+        return False
+
+
+def generate_fast_fixtures(w3: Web3, total_txs: int):
+    """Genera `total_txs` transacciones variadas a máxima velocidad, repartidas en FAST_DAYS_TO_SPAN días."""
+    funder = w3.eth.accounts[0]
+    senders = derive_accounts(FAST_SEED, FAST_SENDER_ACCOUNTS)
+    receivers = [account.address for account in senders]
+    fund_accounts(w3, funder, senders, FAST_FUNDING_ETH)
+    contracts = deploy_fixture_contracts(w3, funder)
+
+    gas_price = w3.eth.gas_price
+    chain_id = w3.eth.chain_id
+    # la EVM en memoria no admite envíos concurrentes
+    workers = 1 if FAST_IN_PROCESS_EVM else len(senders)
+    stats, lock = {'sent': 0, 'errors': 0}, threading.Lock()
+    start_block, start = w3.eth.block_number, time.perf_counter()
+
+    days = max(1, FAST_DAYS_TO_SPAN)
+    can_advance = True
+    for day in range(days):
+        day_total = total_txs // days + (1 if day < total_txs % days else 0)
+        print(f"\nDía {day + 1}/{days}: {day_total} transacciones con {workers} emisores...")
+
+        if workers == 1:
+            # en la EVM en memoria un único hilo reparte las transacciones entre todas las cuentas
+            for i, sender in enumerate(senders):
+                share = day_total // len(senders) + (1 if i < day_total % len(senders) else 0)
+                run_sender(w3, sender, receivers, contracts, share, gas_price, chain_id, stats, lock)
+        else:
+            per_sender = [day_total // workers + (1 if i < day_total % workers else 0) for i in range(workers)]
+            threads = [
+                threading.Thread(target=run_sender, args=(w3, sender, receivers, contracts, count, gas_price, chain_id, stats, lock))
+                for sender, count in zip(senders, per_sender)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        elapsed = time.perf_counter() - start
+        print(f"  Enviadas {stats['sent']} (rechazadas {stats['errors']}) en {elapsed:.1f} s: {stats['sent'] / elapsed:.0f} tx/s")
+        if day < days - 1 and can_advance:
+            can_advance = advance_one_day(w3)
+
+    # esperar a que el nodo mine todo lo pendiente
+    pending = [w3.eth.get_transaction_count(s.address, 'pending') for s in senders]
+    while [w3.eth.get_transaction_count(s.address, 'latest') for s in senders] != pending:
+        time.sleep(0.5)
+
+    elapsed = time.perf_counter() - start
+    print(f"\n{stats['sent']} transacciones minadas entre los bloques {start_block + 1} y {w3.eth.block_number} "
+          f"en {elapsed:.1f} s ({stats['sent'] / elapsed:.0f} tx/s).")
+    print(f"Cuentas generadas (semilla '{FAST_SEED}'): {', '.join(receivers[:3])}...")
+
+
 def main():
     """Función principal que orquesta la generación de transacciones."""
+    if MODE == 'fast':
+        w3 = setup_fast_web3()
+        generate_fast_fixtures(w3, TOTAL_TRANSACTIONS)
+        print("\n--- Script de generación de transacciones finalizado ---")
+        return
+
     # 1. Conexión a Web3
     w3 = setup_web3(RPC_URL)
     
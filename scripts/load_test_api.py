@@ -0,0 +1,202 @@
+import os
+import sys
+import time
+import asyncio
+import statistics
+import multiprocessing
+import aiohttp
+import uvicorn
+from fastapi import FastAPI
+from pydantic import BaseModel
+from web3 import Web3
+
+# permite importar los módulos de `src` al ejecutar el script desde cualquier directorio
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src import analysis, async_analysis, blockchain_utils
+from src.cache import wallet_cache
+
+# ==============================================================================
+# PARÁMETROS DE CONFIGURACIÓN
+# ==============================================================================
+# Edita estos valores para controlar la prueba de carga.
+
+# URL del nodo RPC y dirección del contrato WalletDataCache. El contrato solo se lee:
+# la prueba no envía transacciones de actualización. Usa un contrato sin datos de estas
+# wallets (recién desplegado) para que cada petición recorra toda la cadena.
+RPC_URL = 'http://127.0.0.1:8545/'
+CONTRACT_ADDRESS = '0xDireccionDelContrato'
+
+# Dirección en la que se levanta la API de prueba de cada escenario.
+HOST = '127.0.0.1'
+PORT = 8765
+
+# Número total de peticiones por escenario y cuántas se mantienen en vuelo a la vez.
+TOTAL_REQUESTS = 2000
+CONCURRENCY = 500
+
+# Número de cuentas del nodo que se usarán como wallets a analizar.
+WALLETS_TO_USE = 10
+
+# Escenarios a comparar: el mismo análisis en un handler `def`, que FastAPI ejecuta en su
+# threadpool con el motor síncrono, y en un handler `async def` con el motor asíncrono.
+SCENARIOS = {
+    "def        POST /analyze/sync": "/analyze/sync",
+    "async def  POST /analyze/async": "/analyze/async",
+}
+
+# ==============================================================================
+# FUNCIONES DEL SCRIPT
+# ==============================================================================
+
+class WalletRequest(BaseModel):
+    wallet_address: str
+
+def build_app() -> FastAPI:
+    """API de prueba con el mismo análisis en forma `def` y `async def`, sin escribir en el contrato."""
+    w3 = blockchain_utils.connect_to_node(RPC_URL)
+    contract = blockchain_utils.get_contract_instance(w3, CONTRACT_ADDRESS)
+    async_w3, async_contract = blockchain_utils.build_async_connection(RPC_URL, CONTRACT_ADDRESS)
+    app = FastAPI()
+
+    @app.get("/health")
+    def health():
+        return {"status": "ok"}
+
+    # cada petición hace el análisis completo: la caché en memoria se vacía antes y después de
+    # cada una, o a partir de la primera petición por wallet solo se medirían aciertos de caché
+    @app.post("/analyze/sync")
+    def analyze_sync(request: WalletRequest):
+        wallet_cache.remove(request.wallet_address)
+        try:
+            metrics, last_block = analysis.run_full_analysis_and_update(w3, contract, request.wallet_address)
+        finally:
+            wallet_cache.remove(request.wallet_address)
+        return {"metrics": {key: str(value) for key, value in metrics.items()}, "last_block": last_block}
+
+    @app.post("/analyze/async")
+    async def analyze_async(request: WalletRequest):
+        wallet_cache.remove(request.wallet_address)
+        try:
+            metrics, last_block = await async_analysis.run_full_analysis_and_update(
+                async_w3, async_contract, request.wallet_address
+            )
+        finally:
+            wallet_cache.remove(request.wallet_address)
+        return {"metrics": {key: str(value) for key, value in metrics.items()}, "last_block": last_block}
+
+    return app
+
+def serve():
+    """Proceso de la API de prueba de un escenario."""
+    uvicorn.run(build_app(), host=HOST, port=PORT, log_level="warning")
+
+def get_wallets(rpc_url: str, num_wallets: int) -> list[str]:
+    """Obtiene las cuentas del nodo que se usarán como wallets a analizar."""
+    w3 = Web3(Web3.HTTPProvider(rpc_url))
+    if not w3.is_connected():
+        print(f"Error: No se pudo conectar al nodo en {rpc_url}.")
+        sys.exit(1)
+    if not blockchain_utils.get_contract_instance(w3, CONTRACT_ADDRESS):
+        print(f"Error: No se pudo instanciar el contrato en {CONTRACT_ADDRESS}.")
+        sys.exit(1)
+    accounts = w3.eth.accounts[:num_wallets]
+    if not accounts:
+        print("Error: El nodo no reporta cuentas.")
+        sys.exit(1)
+    return accounts
+
+async def wait_until_up(base_url: str, timeout: float = 30):
+    """Espera a que la API de prueba responda."""
+    deadline = time.perf_counter() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.perf_counter() < deadline:
+            try:
+                async with session.get(f"{base_url}/health") as resp:
+                    if resp.status == 200:
+                        return
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.2)
+    raise RuntimeError(f"La API de prueba no arrancó en {base_url}")
+
+async def run_scenario(url: str, wallets: list[str], total: int, concurrency: int) -> dict:
+    """Lanza `total` peticiones con `concurrency` en vuelo y mide rendimiento y latencias."""
+    latencies, errors, results = [], 0, {}
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    timeout = aiohttp.ClientTimeout(total=600)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def one(i: int):
+            nonlocal errors
+            wallet = wallets[i % len(wallets)]
+            async with semaphore:
+                start = time.perf_counter()
+                try:
+                    async with session.post(url, json={"wallet_address": wallet}) as resp:
+                        body = await resp.json()
+                        if resp.status != 200:
+                            errors += 1
+                            return
+                except Exception:
+                    errors += 1
+                    return
+                latencies.append(time.perf_counter() - start)
+                # métricas de la respuesta más reciente, para comparar ambos escenarios
+                if body["last_block"] >= results.get(wallet, {}).get("last_block", -1):
+                    results[wallet] = body
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "ok": len(latencies),
+        "errors": errors,
+        "elapsed": elapsed,
+        "rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50": statistics.median(latencies) if latencies else 0.0,
+        "p95": latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0,
+        "results": results,
+    }
+
+def main():
+    """Función principal que ejecuta cada escenario en una API recién arrancada y muestra la comparación."""
+    wallets = get_wallets(RPC_URL, WALLETS_TO_USE)
+    base_url = f"http://{HOST}:{PORT}"
+    print(f"Prueba de carga: {TOTAL_REQUESTS} peticiones, {CONCURRENCY} concurrentes, {len(wallets)} wallets.\n")
+
+    all_results = {}
+    for name, path in SCENARIOS.items():
+        server = multiprocessing.Process(target=serve, daemon=True)
+        server.start()
+        try:
+            asyncio.run(wait_until_up(base_url))
+            result = asyncio.run(run_scenario(f"{base_url}{path}", wallets, TOTAL_REQUESTS, CONCURRENCY))
+        finally:
+            server.terminate()
+            server.join()
+        all_results[name] = result["results"]
+        print(
+            f"{name:<32} {result['rps']:>8.1f} req/s | p50 {result['p50'] * 1000:>8.1f} ms | "
+            f"p95 {result['p95'] * 1000:>8.1f} ms | ok {result['ok']} | errores {result['errors']}"
+        )
+
+    # ambos handlers deben devolver las mismas métricas para el mismo bloque
+    first, second = all_results.values()
+    mismatched = [
+        wallet for wallet in wallets
+        if wallet in first and wallet in second
+        and first[wallet]["last_block"] == second[wallet]["last_block"]
+        and first[wallet]["metrics"] != second[wallet]["metrics"]
+    ]
+    if mismatched:
+        print(f"\nAdvertencia: métricas distintas entre escenarios para {len(mismatched)} wallets: {mismatched}")
+
+    print("\n--- Prueba de carga finalizada ---")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
+
+# ==============================================================================
+# PARÁMETROS DE CONFIGURACIÓN
+# ==============================================================================
+# Edita estos valores para imitar los límites de tu proveedor RPC.
+
+# Nodo al que se reenvían las peticiones y dirección en la que escucha el proxy.
+# Apunta la aplicación (RPC_URL) a http://HOST:PORT/ para probarla contra los límites.
+UPSTREAM_RPC_URL = 'http://127.0.0.1:7545/'
+HOST = '127.0.0.1'
+PORT = 8547
+
+# Peticiones por segundo admitidas; por encima se responde con un error de límite.
+# Cada petición de un lote cuenta por separado, como en los proveedores comerciales.
+MAX_RPS = 50
+
+# Peticiones HTTP simultáneas admitidas antes de responder con un error de límite.
+MAX_CONCURRENT = 8
+
+# Cómo se rechazan las peticiones: 'http' (HTTP 429 con Retry-After) o 'jsonrpc'
+# (HTTP 200 con un error JSON-RPC de código 429, como hacen algunos proveedores).
+THROTTLE_STYLE = 'http'
+RETRY_AFTER_SECONDS = 1
+
+# Fallos aleatorios adicionales: proporción de 429 y de peticiones que se quedan colgadas
+# TIMEOUT_SECONDS (más que el timeout del cliente, para provocar un timeout).
+RANDOM_429_RATE = 0.02
+RANDOM_TIMEOUT_RATE = 0.0
+TIMEOUT_SECONDS = 15
+
+# Latencia añadida a cada petición reenviada, en segundos (mínimo, máximo).
+EXTRA_LATENCY = (0.0, 0.05)
+
+# Segundos entre cada resumen de peticiones atendidas y rechazadas.
+REPORT_INTERVAL = 5
+
+# ==============================================================================
+# FUNCIONES DEL SCRIPT
+# ==============================================================================
+
+lock = threading.Lock()
+bucket = {"tokens": float(MAX_RPS), "updated": time.monotonic()}
+in_flight = [0]
+counters = {"forwarded": 0, "throttled": 0, "timeouts": 0}
+session = requests.Session()
+
+def take_tokens(amount: int) -> bool:
+    """Descuenta `amount` peticiones del cubo de tokens si hay saldo."""
+    with lock:
+        now = time.monotonic()
+        bucket["tokens"] = min(MAX_RPS, bucket["tokens"] + (now - bucket["updated"]) * MAX_RPS)
+        bucket["updated"] = now
+        if bucket["tokens"] < amount:
+            return False
+        bucket["tokens"] -= amount
+        return True
+
+def throttle_body(payload):
+    """Error JSON-RPC de límite para cada petición recibida (o para el lote)."""
+    def error(request):
+        return {"jsonrpc": "2.0", "id": request.get("id"), "error": {"code": 429, "message": "Too Many Requests: rate limit exceeded"}}
+    if isinstance(payload, list):
+        return [error(request) for request in payload]
+    return error(payload)
+
+class ProxyHandler(BaseHTTPRequestHandler):
+    """Reenvía las peticiones JSON-RPC al nodo aplicando los límites configurados."""
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            payload = json.loads(body)
+        except json.JSONDecodeError:
+            self.send_json(400, {"error": "JSON inválido"})
+            return
+        requests_in_body = len(payload) if isinstance(payload, list) else 1
+
+        with lock:
+            in_flight[0] += 1
+            too_many = in_flight[0] > MAX_CONCURRENT
+        try:
+            if random.random() < RANDOM_TIMEOUT_RATE:
+                with lock:
+                    counters["timeouts"] += 1
+                time.sleep(TIMEOUT_SECONDS)
+                return
+            if too_many or random.random() < RANDOM_429_RATE or not take_tokens(requests_in_body):
+                with lock:
+                    counters["throttled"] += 1
+                if THROTTLE_STYLE == 'jsonrpc':
+                    self.send_json(200, throttle_body(payload))
+                else:
+                    self.send_json(429, {"error": "Too Many Requests"}, {"Retry-After": str(RETRY_AFTER_SECONDS)})
+                return
+
+            time.sleep(random.uniform(*EXTRA_LATENCY))
+            upstream = session.post(UPSTREAM_RPC_URL, data=body, headers={"Content-Type": "application/json"}, timeout=60)
+            with lock:
+                counters["forwarded"] += 1
+            self.send_json(upstream.status_code, upstream.content)
+        finally:
+            with lock:
+                in_flight[0] -= 1
+
+    def send_json(self, status: int, body, headers: dict = None):
+        """Envía una respuesta JSON (ya serializada si es bytes)."""
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        try:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError):
+            # el cliente abandonó la petición (por ejemplo, por su propio timeout)
+            pass
+
+    def log_message(self, format, *args):
+        pass
+
+def report():
+    """Imprime periódicamente las peticiones reenviadas y rechazadas."""
+    while True:
+        time.sleep(REPORT_INTERVAL)
+        with lock:
+            print(f"reenviadas: {counters['forwarded']}  rechazadas: {counters['throttled']}  colgadas: {counters['timeouts']}")
+
+def main():
+    """Función principal: levanta el proxy con límites delante del nodo."""
+    server = ThreadingHTTPServer((HOST, PORT), ProxyHandler)
+    server.daemon_threads = True
+    threading.Thread(target=report, daemon=True).start()
+    print(f"Proxy con límites en http://{HOST}:{PORT}/ -> {UPSTREAM_RPC_URL}")
+    print(f"{MAX_RPS} peticiones/s, {MAX_CONCURRENT} simultáneas, rechazos '{THROTTLE_STYLE}'. Ctrl+C para salir.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n--- Proxy detenido ---")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
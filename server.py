@@ -0,0 +1,18 @@
+# server.py
+import uvicorn
+from src.config import API_HOST, API_PORT, API_WORKERS
+
+def main():
+    """
+    Ejecuta la API de forma independiente, sin Streamlit.
+
+    La conexión se toma de RPC_URL, CONTRACT_ADDRESS y OWNER_ADDRESS al arrancar
+    cada worker, por lo que cada proceso tiene su propio pool de conexiones.
+    También puede lanzarse con gunicorn:
+        API_WORKERS=4 gunicorn -k uvicorn.workers.UvicornWorker -w 4 src.api:api_app
+    Con más de un worker la watchlist no está disponible, porque su estado es por proceso.
+    """
+    uvicorn.run("src.api:api_app", host=API_HOST, port=API_PORT, workers=API_WORKERS, log_level="info")
+
+if __name__ == "__main__":
+    main()
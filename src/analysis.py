@@ -1,12 +1,26 @@
 # src/analysis.py
 import datetime
+import logging
 from web3 import Web3
 from typing import Tuple
-from src import blockchain_utils
-from typing import Dict
+from src import blockchain_utils, history
+from src.bloom import BloomStats, may_contain_transfer_for
+from src.cache import WalletCache, wallet_cache
+from typing import Dict, Iterator
 
 # Importa las constantes compartidas desde el módulo de configuración
-from src.config import METRIC_KEYS_ORDER
+from src.config import METRIC_KEYS_ORDER, PROGRESS_CHUNK_SIZE
+
+TRANSFER_SIG = "0x"+ Web3.keccak(text="Transfer(address,address,uint256)").hex()
+ERC165_SIG = Web3.keccak(text="supportsInterface(bytes4)")[:4].hex()
+ERC721_INTERFACE_ID = "0x80ac58cd"
+
+# Contadores del histograma diario de cada wallet: por día, una lista con estos valores
+DAILY_METRIC_KEYS = ["txIn", "txOut", "totalTxs", "failedTxs", "gasUsed", "feePaid"]
+DAILY_INDEX = {key: i for i, key in enumerate(DAILY_METRIC_KEYS)}
+SECONDS_PER_DAY = 24 * 3600
+
+logger = logging.getLogger(__name__)
 
 def get_first_tx_timestamp(w3: Web3, address: str) -> Tuple[int, int]:
     """Encuentra el bloque y timestamp de la primera transacción de una wallet."""
@@ -35,97 +49,353 @@ def get_first_tx_timestamp(w3: Web3, address: str) -> Tuple[int, int]:
     return 0, 0
 
 
-def process_blocks(w3: Web3, address: str, start_block: int, end_block: int):
-    """Procesa un rango de bloques para extraer métricas de reputación."""
-    
-    if start_block > end_block:
-        return None
+def new_accumulators() -> Tuple[Dict, Dict]:
+    """
+    Crea los acumuladores vacíos de métricas y de conjuntos de elementos distintos.
 
-    address = w3.to_checksum_address(address)
-    
+    `stats_sets["daily"]` es el histograma diario de la actividad: día -> contadores
+    en el orden de DAILY_METRIC_KEYS.
+    """
     stats = {key: 0 for key in METRIC_KEYS_ORDER}
     stats_sets = {
         "contracts_created": set(), "seen_erc20": set(),
-        "seen_nfts": set(), "active_days": set()
+        "seen_nfts": set(), "active_days": set(), "daily": {}
     }
-    
-    TRANSFER_SIG = "0x"+ w3.keccak(text="Transfer(address,address,uint256)").hex()
-    ERC165_SIG = w3.keccak(text="supportsInterface(bytes4)")[:4].hex()
-    ERC721_INTERFACE_ID = "0x80ac58cd"
+    return stats, stats_sets
 
-    for b in range(start_block, end_block + 1):
-        try:
-            block = w3.eth.get_block(b, full_transactions=True)
-            time_block = datetime.datetime.fromtimestamp(block.timestamp).strftime("%Y-%m-%d")
-            
-            for tx in block.transactions:
-                is_relevant = (tx.get('to') == address) or (tx.get('from') == address)
-                if is_relevant:
-                    stats["totalTxs"] += 1
-                    stats_sets["active_days"].add(time_block)
-                    
-                    receipt = w3.eth.get_transaction_receipt(tx.hash)
-                    stats["gasUsed"] += receipt.gasUsed
-                    stats["feePaid"] += receipt.gasUsed * tx.gasPrice
-                    
-                    if tx['from'] == address:
-                        stats["txOut"] += 1
-                        if tx.get('to') is None:
-                           stats_sets["contracts_created"].add(receipt.contractAddress)
-                    
-                    if tx.get('to') == address:
-                        stats["txIn"] += 1
-                    
-                    if receipt.status == 0:
-                        stats["failedTxs"] += 1
 
+def copy_accumulators(stats: Dict, stats_sets: Dict) -> Tuple[Dict, Dict]:
+    """Copia independiente de los acumuladores de una wallet."""
+    sets_copy = {key: set(values) for key, values in stats_sets.items() if key != "daily"}
+    sets_copy["daily"] = {day: list(row) for day, row in stats_sets["daily"].items()}
+    return dict(stats), sets_copy
+
+
+def finalize_stats(stats: Dict, stats_sets: Dict) -> Dict:
+    """Devuelve una copia de las métricas con los conteos de elementos distintos resueltos."""
+    result = dict(stats)
+    result["contractsCreatedCount"] = len(stats_sets["contracts_created"])
+    result["distinctErc20Count"] = len(stats_sets["seen_erc20"])
+    result["distinctNftCount"] = len(stats_sets["seen_nfts"])
+    result["activeDaysCount"] = len(stats_sets["active_days"])
+    return result
+
+
+# HexBytes.hex() no incluye el prefijo 0x, y un bytes4 se codifica alineado a la izquierda
+ERC721_PROBE_DATA = "0x" + ERC165_SIG + ERC721_INTERFACE_ID[2:].ljust(64, '0')
+
+
+def _token_kind(w3: Web3, token_address: str, block_number: int) -> str:
+    """Clasifica un contrato que emitió un Transfer como 'nft' (ERC-721) o 'erc20' vía ERC-165."""
+    try:
+        res = w3.eth.call({"to": token_address, "data": ERC721_PROBE_DATA}, block_number)
+        return "nft" if int(res.hex(), 16) else "erc20"
+    except Exception:
+        return "erc20"
+
+
+def block_day(timestamp: int) -> str:
+    """Día (YYYY-MM-DD) al que pertenece el timestamp de un bloque."""
+    return datetime.datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d")
+
+
+def add_daily(stats_sets: Dict, day: str, **counts: int):
+    """Suma los contadores indicados al día `day` del histograma diario."""
+    row = stats_sets["daily"].setdefault(day, [0] * len(DAILY_METRIC_KEYS))
+    for key, value in counts.items():
+        row[DAILY_INDEX[key]] += value
+
+
+def windowed_metrics(daily: Dict, now_timestamp: int, window_days: int) -> Dict:
+    """
+    Métricas de los últimos `window_days` días (incluido el de `now_timestamp`),
+    calculadas solo a partir del histograma diario.
+    """
+    start_day = block_day(now_timestamp - (window_days - 1) * SECONDS_PER_DAY)
+    metrics = {key: 0 for key in DAILY_METRIC_KEYS}
+    active_days = 0
+    for day, row in daily.items():
+        if day < start_day:
+            continue
+        active_days += 1
+        for key, value in zip(DAILY_METRIC_KEYS, row):
+            metrics[key] += value
+    metrics["activeDaysCount"] = active_days
+    return metrics
+
+
+def involved_wallets(tx, accumulators: Dict) -> set:
+    """Wallets seguidas que son emisor o receptor de la transacción."""
+    return {addr for addr in (tx.get('from'), tx.get('to')) if addr in accumulators}
+
+
+def accumulate_tx(accumulators: Dict[str, Tuple[Dict, Dict]], tx, receipt, time_block: str):
+    """Suma una transacción y su recibo a las métricas de las wallets involucradas."""
+    tx_from, tx_to = tx.get('from'), tx.get('to')
+    # las transacciones EIP-1559 no siempre traen gasPrice, el recibo sí trae el precio efectivo
+    gas_price = receipt.get('effectiveGasPrice') or tx.get('gasPrice', 0)
+
+    fee = receipt.gasUsed * gas_price
+    failed = int(receipt.status == 0)
+
+    for address in involved_wallets(tx, accumulators):
+        stats, stats_sets = accumulators[address]
+        stats["totalTxs"] += 1
+        stats_sets["active_days"].add(time_block)
+        stats["gasUsed"] += receipt.gasUsed
+        stats["feePaid"] += fee
+
+        if tx_from == address:
+            stats["txOut"] += 1
+            if tx_to is None:
+               stats_sets["contracts_created"].add(receipt.contractAddress)
+
+        if tx_to == address:
+            stats["txIn"] += 1
+
+        stats["failedTxs"] += failed
+
+        add_daily(
+            stats_sets, time_block,
+            txIn=int(tx_to == address), txOut=int(tx_from == address), totalTxs=1,
+            failedTxs=failed, gasUsed=receipt.gasUsed, feePaid=fee
+        )
+
+
+def accumulate_internal(accumulators: Dict[str, Tuple[Dict, Dict]], from_address: str, to_address: str, time_block: str):
+    """
+    Suma una transacción interna (transferencia de valor dentro de otra transacción).
+
+    No suma gas ni comisiones: los paga la transacción externa que la contiene.
+    """
+    for address in {addr for addr in (from_address, to_address) if addr in accumulators}:
+        stats, stats_sets = accumulators[address]
+        stats["totalTxs"] += 1
+        stats_sets["active_days"].add(time_block)
+        if from_address == address:
+            stats["txOut"] += 1
+        if to_address == address:
+            stats["txIn"] += 1
+        add_daily(stats_sets, time_block, txIn=int(to_address == address), txOut=int(from_address == address), totalTxs=1)
+
+
+def accumulate_created_contract(accumulators: Dict[str, Tuple[Dict, Dict]], creator: str, contract_address: str):
+    """Registra un contrato creado por la wallet, ya sea por una transacción o internamente."""
+    if creator in accumulators and contract_address:
+        accumulators[creator][1]["contracts_created"].add(contract_address)
+
+
+def transfer_log_wallets(log, accumulators: Dict) -> set:
+    """Wallets seguidas que aparecen como emisor o receptor de un log Transfer."""
+    # los topics 1 y 2 de un Transfer son el emisor y el receptor, rellenados a 32 bytes
+    wallets_by_bytes = {bytes.fromhex(addr[2:]): addr for addr in accumulators}
+    return {
+        wallets_by_bytes[bytes(topic)[-20:]]
+        for topic in log['topics'][1:3]
+        if bytes(topic)[-20:] in wallets_by_bytes
+    }
+
+
+def accumulate_token(accumulators: Dict[str, Tuple[Dict, Dict]], wallets: set, token_address: str, kind: str):
+    """Registra un token (ERC-20 o NFT) visto por las wallets indicadas."""
+    set_name = "seen_nfts" if kind == "nft" else "seen_erc20"
+    for address in wallets:
+        accumulators[address][1][set_name].add(token_address)
+
+
+def process_block_for_wallets(
+    w3: Web3,
+    b: int,
+    accumulators: Dict[str, Tuple[Dict, Dict]],
+    include_logs: bool = True,
+    bloom_stats: BloomStats = None
+):
+    """
+    Acumula la actividad del bloque `b` para varias wallets a la vez.
+
+    `accumulators` asocia cada dirección (checksum) con su par `(stats, stats_sets)`.
+    El bloque y sus logs se leen una sola vez para todas las wallets. Los logs solo
+    se piden si el logsBloom del bloque admite un Transfer de alguna wallet; el
+    resultado del filtro se anota en `bloom_stats` si se indica. Con
+    `include_logs=False` se omiten los logs, para quien ya los pide por rango.
+    """
+    block = w3.eth.get_block(b, full_transactions=True)
+    time_block = block_day(block.timestamp)
+
+    for tx in block.transactions:
+        if involved_wallets(tx, accumulators):
+            receipt = w3.eth.get_transaction_receipt(tx.hash)
+            accumulate_tx(accumulators, tx, receipt, time_block)
+
+    if include_logs:
+        hit = may_contain_transfer_for(block.logsBloom, TRANSFER_SIG, accumulators)
+        relevant = 0
+        if hit:
             logs = w3.eth.get_logs({"fromBlock": b, "toBlock": b, "topics": [TRANSFER_SIG]})
-            for log in logs:
-                log_address = w3.to_checksum_address(log['address'])
-                try:
-                    data = ERC165_SIG + ERC721_INTERFACE_ID[2:].rjust(64, '0')
-                    res = w3.eth.call({"to": log_address, "data": data}, b)
-                    if int(res.hex(), 16):
-                        stats_sets["seen_nfts"].add(log_address)
-                    else:
-                        stats_sets["seen_erc20"].add(log_address)
-                except Exception:
-                    stats_sets["seen_erc20"].add(log_address)
-                    
-        except Exception as e:
-            print(f"No se pudo procesar el bloque {b}: {e}")
+            relevant = process_transfer_logs(w3, logs, accumulators)
+        if bloom_stats is not None:
+            bloom_stats.record(hit, relevant > 0)
+
+
+def process_transfer_logs(w3: Web3, logs, accumulators: Dict[str, Tuple[Dict, Dict]]):
+    """
+    Registra los tokens de los logs Transfer en los que participan las wallets seguidas.
+
+    Devuelve cuántos logs involucraban a alguna wallet.
+    """
+    token_kinds = {}
+    relevant = 0
+    for log in logs:
+        wallets = transfer_log_wallets(log, accumulators)
+        if not wallets:
             continue
+        relevant += 1
 
-    stats["contractsCreatedCount"] = len(stats_sets["contracts_created"])
-    stats["distinctErc20Count"] = len(stats_sets["seen_erc20"])
-    stats["distinctNftCount"] = len(stats_sets["seen_nfts"])
-    stats["activeDaysCount"] = len(stats_sets["active_days"])
-    
+        log_address = w3.to_checksum_address(log['address'])
+        if log_address not in token_kinds:
+            token_kinds[log_address] = _token_kind(w3, log_address, log['blockNumber'])
+        accumulate_token(accumulators, wallets, log_address, token_kinds[log_address])
+    return relevant
+
+
+def iter_process_blocks(
+    w3: Web3,
+    address: str,
+    start_block: int,
+    end_block: int,
+    chunk_size: int = PROGRESS_CHUNK_SIZE
+) -> Iterator[Dict]:
+    """
+    Procesa un rango de bloques por tramos y emite el progreso al terminar cada tramo.
+
+    La actividad se localiza con el backend de historial que soporte el nodo
+    (ver `src.history`). Los backends que recorren el rango completo de una vez
+    emiten el progreso cada vez que avanzan `chunk_size` bloques o más.
+    Cada evento es un diccionario con `processed_blocks`, `total_blocks`,
+    `current_block` (último bloque del tramo), `stats` (métricas parciales
+    acumuladas desde `start_block`), `daily` (histograma diario acumulado) y
+    `stats_sets` (conjuntos de elementos distintos vistos, incluido el histograma).
+    Las métricas del último evento son las del rango completo.
+    """
+    if start_block > end_block:
+        return
+
+    address = w3.to_checksum_address(address)
+    stats, stats_sets = new_accumulators()
+    total_blocks = end_block - start_block + 1
+    chunk_size = max(1, chunk_size)
+    backend = history.get_history_backend(w3)
+    next_block = start_block
+
+    def progress_event(current_block: int) -> Dict:
+        progress = {
+            "processed_blocks": current_block - start_block + 1,
+            "total_blocks": total_blocks,
+            "current_block": current_block,
+            "stats": finalize_stats(stats, stats_sets),
+            "daily": stats_sets["daily"],
+            "stats_sets": stats_sets
+        }
+        if backend.bloom_stats.blocks_checked:
+            progress["log_filter"] = backend.bloom_stats.as_dict()
+        return progress
+
+    if backend.scans_whole_range:
+        # el backend recorre todo el rango de una vez y avisa cada vez que avanza
+        snapshot = copy_accumulators(stats, stats_sets)
+        try:
+            for current_block in backend.iter_range(w3, start_block, end_block, {address: (stats, stats_sets)}, chunk_size):
+                yield progress_event(current_block)
+                next_block = current_block + 1
+                snapshot = copy_accumulators(stats, stats_sets)
+        except Exception as e:
+            # si falla, lo que queda del rango se escanea bloque a bloque desde el último avance
+            logger.warning(f"El backend '{backend.name}' falló a partir del bloque {next_block}: {e}")
+            stats, stats_sets = snapshot
+            fallback = history.BlockScanBackend()
+            fallback.bloom_stats = backend.bloom_stats
+            backend = fallback
+
+    for chunk_start in range(next_block, end_block + 1, chunk_size):
+        chunk_end = min(chunk_start + chunk_size - 1, end_block)
+        snapshot = copy_accumulators(stats, stats_sets)
+        try:
+            backend.process_range(w3, chunk_start, chunk_end, {address: (stats, stats_sets)})
+        except Exception as e:
+            if isinstance(backend, history.BlockScanBackend):
+                raise
+            # si el backend por dirección falla en un tramo, ese tramo se escanea bloque a bloque
+            logger.warning(f"El backend '{backend.name}' falló en los bloques {chunk_start}-{chunk_end}: {e}")
+            stats, stats_sets = snapshot
+            fallback = history.BlockScanBackend()
+            fallback.bloom_stats = backend.bloom_stats
+            fallback.process_range(w3, chunk_start, chunk_end, {address: (stats, stats_sets)})
+
+        yield progress_event(chunk_end)
+
+    if backend.bloom_stats.blocks_checked:
+        logger.info(f"Prefiltrado logsBloom para {address}: {backend.bloom_stats.as_dict()}")
+
+
+def process_blocks(w3: Web3, address: str, start_block: int, end_block: int):
+    """Procesa un rango de bloques para extraer métricas de reputación."""
+    stats = None
+    for progress in iter_process_blocks(w3, address, start_block, end_block):
+        stats = progress["stats"]
     return stats
 
-def run_full_analysis_and_update(
-    w3: Web3, 
-    contract, 
-    wallet_address: str, 
-    owner_address: str = None, 
-    owner_pk: str = None
-) -> Tuple[Dict, int]:
+
+def merge_metrics(base_metrics: Dict, new_metrics: Dict) -> Dict:
+    """Suma las métricas nuevas sobre las acumuladas, conservando la primera transacción."""
+    merged = dict(base_metrics)
+    for key in METRIC_KEYS_ORDER:
+        if key == "firstTxTimestamp": continue
+        merged[key] += new_metrics.get(key, 0)
+    return merged
+
+
+def store_daily_histogram(
+    w3: Web3,
+    wallet_address: str,
+    daily: Dict,
+    start_block: int,
+    end_block: int,
+    cache: WalletCache = wallet_cache
+):
     """
-    Ejecuta el ciclo completo de análisis y opcionalmente actualiza el contrato.
-    
-    Args:
-        w3: Instancia de Web3.
-        contract: Instancia del contrato.
-        wallet_address: Dirección a analizar.
-        owner_address (opcional): Dirección del owner para la transacción de actualización.
-        owner_pk (opcional): Clave privada para firmar la transacción de actualización. Si es None, no se actualiza.
+    Incorpora a la caché el histograma diario de los bloques `start_block`-`end_block`.
 
-    Returns:
-        Una tupla con (diccionario de métricas finales, último bloque analizado).
+    Si continúa el histograma guardado se suma a él; si no, lo reemplaza y cubre
+    desde el día de `start_block` (una lectura del bloque, salvo desde el génesis).
     """
-    #  leer de la caché del contrato
-    cached_metrics, last_block = blockchain_utils.get_cached_data_from_contract(contract, wallet_address)
-    
+    if cache.extend_daily(wallet_address, daily, start_block, end_block):
+        return
+    since = block_day(w3.eth.get_block(start_block).timestamp) if start_block > 0 else None
+    cache.set_daily(wallet_address, daily, since, end_block)
+
+
+def iter_full_analysis_and_update(
+    w3: Web3,
+    contract,
+    wallet_address: str,
+    owner_address: str = None,
+    owner_pk: str = None,
+    sets: Dict = None
+) -> Iterator[Dict]:
+    """
+    Versión incremental de `run_full_analysis_and_update`.
+
+    Emite eventos `{"type": "progress", ...}` por cada tramo de bloques procesado,
+    con las métricas acumuladas hasta ese punto en `metrics`, y termina con un
+    evento `{"type": "result", "metrics": ..., "last_block": ...}`.
+    Si se pasa `sets`, se rellena con los conjuntos de elementos distintos de los
+    bloques analizados, para seguir contando desde ahí sin repetir elementos.
+    """
+    #  leer de la caché en memoria y, si no está, de la caché del contrato
+    cached_metrics, last_block = wallet_cache.get(wallet_address)
+    if not cached_metrics:
+        cached_metrics, last_block = blockchain_utils.get_cached_data_from_contract(contract, wallet_address)
+
     start_block = 0
     if cached_metrics:
         final_metrics = cached_metrics
@@ -137,26 +407,65 @@ def run_full_analysis_and_update(
     if final_metrics.get("firstTxTimestamp", 0) == 0:
         _, first_ts = get_first_tx_timestamp(w3, wallet_address)
         final_metrics["firstTxTimestamp"] = first_ts
-    
+
     if final_metrics["firstTxTimestamp"] == 0:
-        return final_metrics, last_block
-    else:
-        # analizar nuevos bloques
-        end_block = w3.eth.block_number
-        if start_block <= end_block:
-            new_metrics = process_blocks(w3, wallet_address, start_block, end_block)
-            if new_metrics:
-                for key in METRIC_KEYS_ORDER:
-                    if key == "firstTxTimestamp": continue
-                    final_metrics[key] += new_metrics.get(key, 0)
-    
-        
+        yield {"type": "result", "metrics": final_metrics, "last_block": last_block}
+        return
+
+    # analizar nuevos bloques
+    end_block = w3.eth.block_number
+    if start_block <= end_block:
+        new_metrics, new_daily, new_sets = None, {}, None
+        for progress in iter_process_blocks(w3, wallet_address, start_block, end_block):
+            new_metrics, new_daily, new_sets = progress["stats"], progress["daily"], progress["stats_sets"]
+            yield {
+                "type": "progress",
+                "processed_blocks": progress["processed_blocks"],
+                "total_blocks": progress["total_blocks"],
+                "current_block": progress["current_block"],
+                "metrics": merge_metrics(final_metrics, new_metrics),
+                **({"log_filter": progress["log_filter"]} if "log_filter" in progress else {})
+            }
+        if new_metrics:
+            final_metrics = merge_metrics(final_metrics, new_metrics)
+            store_daily_histogram(w3, wallet_address, new_daily, start_block, end_block)
+            if sets is not None:
+                sets.update(new_sets)
+
     # actualizar el contrato (si se proporcionaron las credenciales)
     if owner_address and owner_pk:
-        # print(f"Actualizando contrato para la wallet {wallet_address}...")
         blockchain_utils.update_data_in_contract(
             w3, contract, owner_address, owner_pk, wallet_address, final_metrics, end_block
         )
-        # print("Actualización de contrato enviada.")
-        
-    return final_metrics, end_block
+
+    wallet_cache.set(wallet_address, final_metrics, end_block)
+
+    yield {"type": "result", "metrics": final_metrics, "last_block": end_block}
+
+
+def run_full_analysis_and_update(
+    w3: Web3, 
+    contract, 
+    wallet_address: str, 
+    owner_address: str = None, 
+    owner_pk: str = None,
+    sets: Dict = None
+) -> Tuple[Dict, int]:
+    """
+    Ejecuta el ciclo completo de análisis y opcionalmente actualiza el contrato.
+    
+    Args:
+        w3: Instancia de Web3.
+        contract: Instancia del contrato.
+        wallet_address: Dirección a analizar.
+        owner_address (opcional): Dirección del owner para la transacción de actualización.
+        owner_pk (opcional): Clave privada para firmar la transacción de actualización. Si es None, no se actualiza.
+        sets (opcional): Diccionario que se rellena con los conjuntos de elementos distintos de los bloques analizados.
+
+    Returns:
+        Una tupla con (diccionario de métricas finales, último bloque analizado).
+    """
+    result = {}
+    for event in iter_full_analysis_and_update(w3, contract, wallet_address, owner_address, owner_pk, sets):
+        result = event
+    return result["metrics"], result["last_block"]
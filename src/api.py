@@ -1,9 +1,24 @@
 # src/api.py
+import os
+import json
+import logging
+import tempfile
+from typing import Dict, Optional
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException, Depends, Query
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.background import BackgroundTask
 from pydantic import BaseModel, Field
-from web3 import Web3
-from src import analysis, blockchain_utils
-from src.config import OWNER_PRIVATE_KEY
+from web3 import AsyncWeb3, Web3
+from src import analysis, async_analysis, blockchain_utils, bootstrap, snapshot, reputation, rate_limit
+from src.cache import wallet_cache
+from src.watchlist import watchlist
+from src.config import (
+    OWNER_PRIVATE_KEY, OWNER_ADDRESS_ENV, CONTRACT_ADDRESS_ENV, RPC_URL_ENV, CACHE_BOOTSTRAP, SNAPSHOT_IMPORT_PATH,
+    API_WORKERS
+)
+
+logger = logging.getLogger(__name__)
 
 class WalletRequest(BaseModel):
     """El JSON que el cliente debe enviar en su petición."""
@@ -25,22 +40,35 @@ class ReputationMetrics(BaseModel):
     activeDaysCount: int
     firstTxTimestamp: int
 
+class WindowMetrics(BaseModel):
+    """Las métricas de una ventana de días, calculadas a partir del histograma diario."""
+    txIn: int
+    txOut: int
+    totalTxs: int
+    failedTxs: int
+    gasUsed: int
+    feePaid: int
+    activeDaysCount: int
+
+class WindowedReputation(BaseModel):
+    """El sub-modelo para las métricas y la reputación de los últimos días."""
+    days: int = Field(..., description="Tamaño de la ventana en días, incluido el actual.")
+    complete: bool = Field(..., description="Si el histograma cubre la ventana completa.")
+    since: Optional[str] = Field(None, description="Día desde el que hay histograma; null si cubre desde el génesis.")
+    metrics: WindowMetrics
+    reputation_score: float
+    normalized_metrics: Dict[str, float]
+
 class WalletResponse(BaseModel):
     """El JSON que la API devolverá en una respuesta exitosa."""
     wallet_address: str = Field(..., description="La dirección analizada en formato checksum.")
     last_block_analyzed: int = Field(..., description="El último número de bloque que se consideró en el análisis.")
     metrics: ReputationMetrics
+    window: Optional[WindowedReputation] = Field(None, description="Métricas y reputación de la ventana pedida con `window`.")
     status: str = "success"
     message: str = "Reputation data retrieved successfully."
 
 
-# instancia de FastAPI
-api_app = FastAPI(
-    title="API de Reputación de Wallets",
-    description="Una API para obtener métricas de reputación on-chain.",
-    version="1.0.0"
-)
-
 # estado compartido para la conexión a la blockchain
 SHARED_STATE = {
     "w3": None,
@@ -48,6 +76,66 @@ SHARED_STATE = {
     "owner_address": None
 }
 
+
+def connect_from_env() -> bool:
+    """
+    Conecta la API usando RPC_URL, CONTRACT_ADDRESS y OWNER_ADDRESS del entorno.
+
+    Permite ejecutar la API sin la interfaz de Streamlit. Devuelve True si la
+    conexión y el contrato quedaron listos en el estado compartido.
+    """
+    if not RPC_URL_ENV or not CONTRACT_ADDRESS_ENV:
+        return False
+
+    w3 = blockchain_utils.connect_to_node(RPC_URL_ENV)
+    if not w3:
+        logger.error(f"No se pudo conectar al nodo en {RPC_URL_ENV}.")
+        return False
+
+    contract = blockchain_utils.get_contract_instance(w3, CONTRACT_ADDRESS_ENV)
+    if not contract:
+        logger.error(f"No se pudo instanciar el contrato en {CONTRACT_ADDRESS_ENV}.")
+        return False
+
+    SHARED_STATE["w3"] = w3
+    SHARED_STATE["contract"] = contract
+    SHARED_STATE["owner_address"] = OWNER_ADDRESS_ENV or None
+    return True
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Conecta cada worker al arrancar (si no lo hizo ya la interfaz), precarga la caché
+    en memoria desde un snapshot y los eventos del contrato, y al cerrar detiene la
+    watchlist y guarda los histogramas diarios en el checkpoint de la precarga.
+    """
+    if SNAPSHOT_IMPORT_PATH:
+        try:
+            snapshot.import_snapshot(SNAPSHOT_IMPORT_PATH)
+        except Exception as e:
+            logger.error(f"No se pudo importar el snapshot {SNAPSHOT_IMPORT_PATH}: {e}")
+    if not SHARED_STATE.get("w3") and connect_from_env():
+        logger.info("API conectada a la blockchain desde la configuración del entorno.")
+        if CACHE_BOOTSTRAP:
+            bootstrap.start_bootstrap(SHARED_STATE["w3"], SHARED_STATE["contract"])
+    yield
+    watchlist.stop()
+    if CACHE_BOOTSTRAP and SHARED_STATE.get("w3") and SHARED_STATE.get("contract"):
+        try:
+            bootstrap.save_daily_histograms(SHARED_STATE["w3"], SHARED_STATE["contract"])
+        except Exception as e:
+            logger.error(f"No se pudieron guardar los histogramas diarios: {e}")
+
+
+# instancia de FastAPI
+api_app = FastAPI(
+    title="API de Reputación de Wallets",
+    description="Una API para obtener métricas de reputación on-chain.",
+    version="1.0.0",
+    lifespan=lifespan
+)
+
 def get_shared_state():
     """Dependencia de FastAPI para obtener el estado compartido."""
     if not SHARED_STATE.get("w3") or not SHARED_STATE.get("contract"):
@@ -58,6 +146,86 @@ def get_shared_state():
     return SHARED_STATE
 
 
+def get_owner_credentials():
+    """Devuelve la dirección y la clave privada del owner o lanza un 503 si faltan."""
+    owner_address = SHARED_STATE.get("owner_address")
+    if not owner_address or not OWNER_PRIVATE_KEY:
+        raise HTTPException(
+            status_code=503, 
+            detail="Credenciales del owner no configuradas. No se puede actualizar el contrato."
+        )
+    return owner_address, OWNER_PRIVATE_KEY
+
+
+def require_single_worker():
+    """
+    Dependencia de los endpoints de la watchlist: su estado vive en la memoria de un proceso,
+    así que con varios workers cada petición vería (y modificaría) una watchlist distinta.
+    """
+    if API_WORKERS > 1:
+        raise HTTPException(
+            status_code=501,
+            detail="La watchlist solo está disponible con un único worker (API_WORKERS=1)."
+        )
+
+
+def format_sse(event: str, data: dict) -> str:
+    """Serializa un evento en formato Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def get_async_state():
+    """
+    Dependencia para los endpoints async: añade la conexión AsyncWeb3 al estado compartido.
+
+    Se crea a partir del mismo nodo y contrato que la conexión síncrona, y se
+    vuelve a crear si la interfaz cambia de nodo o de contrato.
+    """
+    state = get_shared_state()
+    endpoint = state["w3"].provider.endpoint_uri
+    contract_address = state["contract"].address
+    if state.get("async_source") != (endpoint, contract_address):
+        state["async_w3"], state["async_contract"] = blockchain_utils.build_async_connection(endpoint, contract_address)
+        state["async_source"] = (endpoint, contract_address)
+    return state
+
+
+async def build_window(
+    w3: AsyncWeb3,
+    wallet_address: str,
+    first_tx_timestamp: int,
+    window_days: Optional[int]
+) -> Optional[WindowedReputation]:
+    """
+    Métricas y reputación de los últimos `window_days` días a partir del histograma
+    diario en caché. Devuelve None si no se pidió ventana o no hay histograma.
+
+    La ventana acaba en el día del último bloque de la cadena, no en la hora del
+    servidor, así que con un nodo local o con el reloj desfasado se calcula igual.
+    Es la única llamada RPC.
+    """
+    if not window_days or not first_tx_timestamp:
+        return None
+    daily, since, _ = wallet_cache.get_daily(wallet_address)
+    if daily is None:
+        return None
+
+    now = (await w3.eth.get_block("latest")).timestamp
+    metrics = analysis.windowed_metrics(daily, now, window_days)
+    score, normalized = reputation.reputation_from_metrics(
+        {**metrics, "firstTxTimestamp": first_tx_timestamp}, now, window_days=window_days
+    )
+    window_start = analysis.block_day(now - (window_days - 1) * analysis.SECONDS_PER_DAY)
+    return WindowedReputation(
+        days=window_days,
+        complete=since is None or since < window_start,
+        since=since,
+        metrics=WindowMetrics(**metrics),
+        reputation_score=score,
+        normalized_metrics=normalized
+    )
+
+
 # !--- Endpoints de la API ---
 
 @api_app.get("/", tags=["Status"])
@@ -66,36 +234,70 @@ def read_root():
     return {"status": "API de Reputación de Wallets está en línea."}
 
 
+@api_app.get("/health", tags=["Status"])
+def health():
+    """Liveness: el proceso responde, aunque no esté conectado a la blockchain."""
+    return {"status": "ok"}
+
+
+@api_app.get("/ready", tags=["Status"])
+def ready():
+    """Readiness: el worker tiene conexión al nodo y contrato, y puede atender análisis."""
+    w3 = SHARED_STATE.get("w3")
+    if not w3 or not SHARED_STATE.get("contract"):
+        raise HTTPException(status_code=503, detail="Sin conexión a la blockchain.")
+    try:
+        block_number = w3.eth.block_number
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"El nodo no responde: {str(e)}")
+    return {
+        "status": "ready",
+        "block_number": block_number,
+        "cache_bootstrap": dict(bootstrap.bootstrap_status),
+        "rpc_limits": rate_limit.limiter_status()
+    }
+
+
 @api_app.post("/analyze", response_model=WalletResponse, tags=["Análisis"])
-def analyze_wallet(
+async def analyze_wallet(
     request: WalletRequest,
-    state: dict = Depends(get_shared_state)
+    window: Optional[int] = Query(None, ge=1, le=3650, description="Días de la ventana para métricas y reputación recientes."),
+    state: dict = Depends(get_async_state)
 ):
     """
     Analiza una wallet y actualiza los datos en el smart contract.
+
+    Es nativamente asíncrono: las llamadas RPC no ocupan hilos del threadpool,
+    así que las peticiones concurrentes solo quedan limitadas por el nodo.
+    Con `window`, la respuesta incluye también las métricas y la reputación de
+    los últimos días, calculadas con el histograma diario sin más llamadas RPC.
     """
-    w3 = state["w3"]
-    contract = state["contract"]
+    w3 = state["async_w3"]
+    contract = state["async_contract"]
     
     if not Web3.is_address(request.wallet_address):
         raise HTTPException(status_code=400, detail="La dirección de la wallet proporcionada no es válida.")
     
     checksum_address = w3.to_checksum_address(request.wallet_address)
 
-    try:
-        # Preparamos las credenciales del owner
-        owner_address = SHARED_STATE.get("owner_address")
-        owner_pk = None
-        
-        if owner_address and OWNER_PRIVATE_KEY:
-            owner_pk = OWNER_PRIVATE_KEY
-        else:
-            raise HTTPException(
-                status_code=503, 
-                detail="Credenciales del owner no configuradas. No se puede actualizar el contrato."
+    # las wallets en la watchlist ya tienen sus métricas al día en la caché en memoria
+    if watchlist.is_ready(checksum_address):
+        cached_metrics, last_block = wallet_cache.get(checksum_address)
+        if cached_metrics:
+            cached_metrics["feePaid"] = str(cached_metrics["feePaid"])
+            cached_metrics["gasUsed"] = str(cached_metrics["gasUsed"])
+            return WalletResponse(
+                wallet_address=checksum_address,
+                last_block_analyzed=last_block,
+                metrics=ReputationMetrics(**cached_metrics),
+                window=await build_window(w3, checksum_address, cached_metrics["firstTxTimestamp"], window),
+                message="Reputation data served from the watchlist cache."
             )
 
-        final_metrics, end_block = analysis.run_full_analysis_and_update(
+    try:
+        owner_address, owner_pk = get_owner_credentials()
+
+        final_metrics, end_block = await async_analysis.run_full_analysis_and_update(
             w3, contract, checksum_address, owner_address, owner_pk
         )
 
@@ -107,8 +309,105 @@ def analyze_wallet(
             wallet_address=checksum_address,
             last_block_analyzed=end_block,
             metrics=ReputationMetrics(**final_metrics),
+            window=await build_window(w3, checksum_address, final_metrics["firstTxTimestamp"], window),
             message=f"Reputation data retrieved. On-chain update was {'attempted' if owner_pk else 'skipped'}."
         )
 
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error interno del servidor durante el análisis: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error interno del servidor durante el análisis: {str(e)}")
+
+
+@api_app.get("/analyze/{wallet_address}/stream", tags=["Análisis"])
+def analyze_wallet_stream(
+    wallet_address: str,
+    state: dict = Depends(get_shared_state)
+):
+    """
+    Analiza una wallet emitiendo el progreso como Server-Sent Events.
+
+    Envía un evento `progress` por cada tramo de bloques procesado, con las
+    métricas parciales, y un evento final `result` (o `error` si falla).
+    """
+    w3 = state["w3"]
+    contract = state["contract"]
+
+    if not Web3.is_address(wallet_address):
+        raise HTTPException(status_code=400, detail="La dirección de la wallet proporcionada no es válida.")
+
+    checksum_address = w3.to_checksum_address(wallet_address)
+    owner_address, owner_pk = get_owner_credentials()
+
+    def event_stream():
+        try:
+            for event in analysis.iter_full_analysis_and_update(
+                w3, contract, checksum_address, owner_address, owner_pk
+            ):
+                payload = {key: value for key, value in event.items() if key != "type"}
+                payload["wallet_address"] = checksum_address
+                yield format_sse(event["type"], payload)
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Error interno del servidor durante el análisis: {str(e)}"})
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream")
+
+
+@api_app.get("/watchlist", tags=["Watchlist"], dependencies=[Depends(require_single_worker)])
+def list_watched_wallets():
+    """Lista las wallets vigiladas y el último bloque incorporado a sus métricas."""
+    return {"wallets": watchlist.status()}
+
+
+@api_app.post("/watchlist", status_code=202, tags=["Watchlist"], dependencies=[Depends(require_single_worker)])
+def watch_wallet(
+    request: WalletRequest,
+    state: dict = Depends(get_shared_state)
+):
+    """
+    Añade una wallet a la watchlist.
+
+    Su análisis se pone al día en segundo plano y después se actualiza con cada
+    bloque nuevo, por lo que `/analyze` la devuelve sin escanear.
+    """
+    if not Web3.is_address(request.wallet_address):
+        raise HTTPException(status_code=400, detail="La dirección de la wallet proporcionada no es válida.")
+
+    checksum_address = Web3.to_checksum_address(request.wallet_address)
+    watchlist.start(state["w3"], state["contract"])
+    watchlist.add(checksum_address)
+    return {"wallet_address": checksum_address, "status": "watching"}
+
+
+@api_app.delete("/watchlist/{wallet_address}", tags=["Watchlist"], dependencies=[Depends(require_single_worker)])
+def unwatch_wallet(wallet_address: str):
+    """Elimina una wallet de la watchlist."""
+    if not Web3.is_address(wallet_address):
+        raise HTTPException(status_code=400, detail="La dirección de la wallet proporcionada no es válida.")
+
+    checksum_address = Web3.to_checksum_address(wallet_address)
+    if not watchlist.remove(checksum_address):
+        raise HTTPException(status_code=404, detail="La wallet no está en la watchlist.")
+    return {"wallet_address": checksum_address, "status": "removed"}
+
+
+@api_app.get("/snapshot", tags=["Snapshots"])
+def export_snapshot(state: dict = Depends(get_shared_state)):
+    """
+    Descarga un snapshot Parquet con las métricas, el último bloque y la reputación
+    de todas las wallets en la caché de este worker, sin analizar ni escribir en el contrato.
+    """
+    w3 = state["w3"]
+    head = w3.eth.get_block("latest")
+    fd, path = tempfile.mkstemp(suffix=".parquet")
+    os.close(fd)
+    try:
+        snapshot.export_snapshot(path, snapshot.iter_cached_wallets(), head.timestamp, head.number)
+    except RuntimeError as e:
+        os.remove(path)
+        raise HTTPException(status_code=503, detail=str(e))
+
+    return FileResponse(
+        path,
+        media_type="application/vnd.apache.parquet",
+        filename=f"wallet_metrics_{head.number}.parquet",
+        background=BackgroundTask(os.remove, path)
+    )
@@ -0,0 +1,217 @@
+# src/async_analysis.py
+import asyncio
+import logging
+from typing import Dict, Tuple
+from web3 import AsyncWeb3, Web3
+
+from src import analysis, async_history, blockchain_utils
+from src.analysis import TRANSFER_SIG, ERC721_PROBE_DATA
+from src.bloom import may_contain_transfer_for
+from src.cache import wallet_cache
+from src.config import METRIC_KEYS_ORDER, ASYNC_BLOCK_CONCURRENCY, HISTORY_BACKEND
+
+logger = logging.getLogger(__name__)
+
+# Motor de análisis asíncrono: mismas métricas que `analysis`, pero las llamadas RPC
+# se esperan sin bloquear el event loop y los bloques de un rango se leen en paralelo.
+# Los backends de historial por dirección tienen su versión asíncrona en `src.async_history`;
+# solo la bisección de estado, que nunca se elige automáticamente, se ejecuta en un hilo con
+# una conexión síncrona al mismo nodo.
+
+# conexión síncrona reutilizada por endpoint para la bisección de estado
+_history_nodes: Dict[str, Web3] = {}
+
+
+async def get_first_tx_timestamp(w3: AsyncWeb3, address: str) -> Tuple[int, int]:
+    """Versión asíncrona de `analysis.get_first_tx_timestamp`."""
+    address = w3.to_checksum_address(address)
+    low, high = 0, await w3.eth.block_number
+    first_block_num = 0
+
+    # Búsqueda binaria para la primera transacción saliente
+    while low <= high:
+        mid = (low + high) // 2
+        try:
+            if await w3.eth.get_transaction_count(address, mid) > 0:
+                first_block_num = mid
+                high = mid - 1
+            else:
+                low = mid + 1
+        except Exception:
+             low = mid + 1
+
+    if first_block_num > 0:
+        try:
+            block_data = await w3.eth.get_block(first_block_num)
+            return first_block_num, block_data.timestamp
+        except Exception:
+            return 0, 0
+    return 0, 0
+
+
+async def _token_kind(w3: AsyncWeb3, token_address: str, block_number: int) -> str:
+    """Versión asíncrona de la clasificación ERC-20 / ERC-721 de un token."""
+    try:
+        res = await w3.eth.call({"to": token_address, "data": ERC721_PROBE_DATA}, block_number)
+        return "nft" if int(res.hex(), 16) else "erc20"
+    except Exception:
+        return "erc20"
+
+
+async def process_block_for_wallets(w3: AsyncWeb3, b: int, accumulators: Dict[str, Tuple[Dict, Dict]]):
+    """Versión asíncrona de `analysis.process_block_for_wallets`; los recibos se piden en paralelo."""
+    block = await w3.eth.get_block(b, full_transactions=True)
+    time_block = analysis.block_day(block.timestamp)
+
+    relevant = [tx for tx in block.transactions if analysis.involved_wallets(tx, accumulators)]
+    receipts = await asyncio.gather(*(w3.eth.get_transaction_receipt(tx.hash) for tx in relevant))
+    for tx, receipt in zip(relevant, receipts):
+        analysis.accumulate_tx(accumulators, tx, receipt, time_block)
+
+    # sin un posible Transfer de las wallets en el logsBloom no hace falta pedir los logs
+    if not may_contain_transfer_for(block.logsBloom, TRANSFER_SIG, accumulators):
+        return
+    logs = await w3.eth.get_logs({"fromBlock": b, "toBlock": b, "topics": [TRANSFER_SIG]})
+
+    token_logs = []
+    for log in logs:
+        wallets = analysis.transfer_log_wallets(log, accumulators)
+        if wallets:
+            token_logs.append((w3.to_checksum_address(log['address']), wallets))
+
+    tokens = list({token for token, _ in token_logs})
+    kinds = dict(zip(tokens, await asyncio.gather(*(_token_kind(w3, token, b) for token in tokens))))
+    for token, wallets in token_logs:
+        analysis.accumulate_token(accumulators, wallets, token, kinds[token])
+
+
+def _history_node(endpoint_uri: str):
+    """Conexión síncrona al nodo de `endpoint_uri`, o None si no responde. Bloquea: se llama en un hilo."""
+    if endpoint_uri not in _history_nodes:
+        w3 = blockchain_utils.connect_to_node(endpoint_uri)
+        if w3 is None:
+            return None
+        _history_nodes[endpoint_uri] = w3
+    return _history_nodes[endpoint_uri]
+
+
+def _process_blocks_with_backend(w3: Web3, address: str, start_block: int, end_block: int):
+    """Recorre el rango con `analysis.iter_process_blocks` y devuelve (métricas, histograma diario)."""
+    stats, daily = None, {}
+    for progress in analysis.iter_process_blocks(w3, address, start_block, end_block):
+        stats, daily = progress["stats"], progress["daily"]
+    return stats, daily
+
+
+async def process_blocks(
+    w3: AsyncWeb3,
+    address: str,
+    start_block: int,
+    end_block: int,
+    concurrency: int = ASYNC_BLOCK_CONCURRENCY
+):
+    """
+    Versión asíncrona de `analysis.process_blocks`, con hasta `concurrency` bloques en vuelo.
+
+    Usa el mismo backend de historial que el análisis síncrono: si el nodo ofrece uno
+    por dirección, el rango se procesa con su versión asíncrona (y, si falla, se escanea);
+    si no, se escanean los bloques de forma asíncrona. Devuelve (métricas, histograma diario) del rango, o (None, {})
+    si el rango está vacío. Si algún bloque no se puede leer tras los reintentos del
+    limitador, lanza RuntimeError.
+    """
+    if start_block > end_block:
+        return None, {}
+
+    address = w3.to_checksum_address(address)
+    if HISTORY_BACKEND == "bisect":
+        sync_w3 = await asyncio.to_thread(_history_node, w3.provider.endpoint_uri)
+        if sync_w3 is not None:
+            return await asyncio.to_thread(_process_blocks_with_backend, sync_w3, address, start_block, end_block)
+
+    backend = await async_history.get_history_backend(w3)
+    if backend is not None:
+        stats, stats_sets = analysis.new_accumulators()
+        try:
+            await backend.process_range(w3, start_block, end_block, {address: (stats, stats_sets)})
+            return analysis.finalize_stats(stats, stats_sets), stats_sets["daily"]
+        except Exception as e:
+            # si el backend por dirección falla, el rango se escanea bloque a bloque
+            logger.warning(f"El backend '{backend.name}' falló en los bloques {start_block}-{end_block}: {e}")
+
+    stats, stats_sets = analysis.new_accumulators()
+    accumulators = {address: (stats, stats_sets)}
+    # los workers comparten el iterador, así no se crea una corrutina por bloque del rango
+    blocks = iter(range(start_block, end_block + 1))
+
+    failed = []
+
+    async def worker():
+        for b in blocks:
+            # si un bloque falla, los demás workers dejan de tomar bloques nuevos
+            if failed:
+                return
+            try:
+                await process_block_for_wallets(w3, b, accumulators)
+            except Exception as e:
+                failed.append((b, e))
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    if failed:
+        # el proveedor ya agotó sus reintentos: omitir el bloque dejaría métricas incompletas
+        b, e = min(failed, key=lambda item: item[0])
+        raise RuntimeError(f"No se pudo procesar el bloque {b}: {e}") from e
+    return analysis.finalize_stats(stats, stats_sets), stats_sets["daily"]
+
+
+async def store_daily_histogram(w3: AsyncWeb3, wallet_address: str, daily: Dict, start_block: int, end_block: int):
+    """Versión asíncrona de `analysis.store_daily_histogram`."""
+    if wallet_cache.extend_daily(wallet_address, daily, start_block, end_block):
+        return
+    since = analysis.block_day((await w3.eth.get_block(start_block)).timestamp) if start_block > 0 else None
+    wallet_cache.set_daily(wallet_address, daily, since, end_block)
+
+
+async def run_full_analysis_and_update(
+    w3: AsyncWeb3,
+    contract,
+    wallet_address: str,
+    owner_address: str = None,
+    owner_pk: str = None
+) -> Tuple[Dict, int]:
+    """Versión asíncrona de `analysis.run_full_analysis_and_update`."""
+    #  leer de la caché en memoria y, si no está, de la caché del contrato
+    cached_metrics, last_block = wallet_cache.get(wallet_address)
+    if not cached_metrics:
+        cached_metrics, last_block = await blockchain_utils.async_get_cached_data_from_contract(contract, wallet_address)
+
+    start_block = 0
+    if cached_metrics:
+        final_metrics = cached_metrics
+        start_block = last_block + 1
+    else:
+        final_metrics = {key: 0 for key in METRIC_KEYS_ORDER}
+
+    #  obtener timestamp de primera tx si es necesario
+    if final_metrics.get("firstTxTimestamp", 0) == 0:
+        _, first_ts = await get_first_tx_timestamp(w3, wallet_address)
+        final_metrics["firstTxTimestamp"] = first_ts
+
+    if final_metrics["firstTxTimestamp"] == 0:
+        return final_metrics, last_block
+
+    # analizar nuevos bloques
+    end_block = await w3.eth.block_number
+    if start_block <= end_block:
+        new_metrics, new_daily = await process_blocks(w3, wallet_address, start_block, end_block)
+        if new_metrics:
+            final_metrics = analysis.merge_metrics(final_metrics, new_metrics)
+            await store_daily_histogram(w3, wallet_address, new_daily, start_block, end_block)
+
+    # actualizar el contrato (si se proporcionaron las credenciales)
+    if owner_address and owner_pk:
+        await blockchain_utils.async_update_data_in_contract(
+            w3, contract, owner_address, owner_pk, wallet_address, final_metrics, end_block
+        )
+
+    wallet_cache.set(wallet_address, final_metrics, end_block)
+    return final_metrics, end_block
@@ -0,0 +1,245 @@
+# src/async_history.py
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from web3 import AsyncWeb3, Web3
+
+from src import analysis, async_analysis
+from src.config import ASYNC_BLOCK_CONCURRENCY, HISTORY_BACKEND, HISTORY_PAGE_SIZE
+from src.history import _address_topic, _to_int
+
+# Versión asíncrona de los backends de historial por dirección de `src.history`, para que
+# el motor asíncrono no tenga que saltar a un hilo. Hacen las mismas llamadas RPC que los
+# síncronos, pero las transacciones y los logs de un rango se piden en paralelo.
+# El escaneo de bloques asíncrono está en `async_analysis.process_blocks`.
+
+
+async def _run_limited(func, items, concurrency: int = ASYNC_BLOCK_CONCURRENCY):
+    """Espera `func(item)` para cada elemento con hasta `concurrency` en vuelo; relanza el primer error."""
+    # los workers comparten el iterador, así no se crea una corrutina por elemento
+    items = iter(items)
+    failed = []
+
+    async def worker():
+        for item in items:
+            # si uno falla, los demás workers dejan de tomar elementos nuevos
+            if failed:
+                return
+            try:
+                await func(item)
+            except Exception as e:
+                failed.append(e)
+
+    await asyncio.gather(*(worker() for _ in range(max(1, concurrency))))
+    if failed:
+        raise failed[0]
+
+
+class AsyncAddressHistoryBackend:
+    """Base de los backends asíncronos que consultan el historial filtrado por dirección."""
+
+    name = "base"
+
+    async def is_available(self, w3: AsyncWeb3) -> bool:
+        """Indica si el nodo soporta las llamadas que necesita el backend."""
+        raise NotImplementedError
+
+    async def process_range(self, w3: AsyncWeb3, start_block: int, end_block: int, accumulators: Dict[str, Tuple[Dict, Dict]]):
+        """Acumula en `accumulators` la actividad de sus wallets entre `start_block` y `end_block`."""
+        self._timestamps = {}
+        self._processed = set()
+        await self._process_history(w3, start_block, end_block, accumulators)
+        await self._process_token_logs(w3, start_block, end_block, accumulators)
+
+    async def _process_history(self, w3, start_block, end_block, accumulators):
+        raise NotImplementedError
+
+    async def _time_block(self, w3: AsyncWeb3, block_number: int) -> str:
+        """Día del bloque, leyendo solo la cabecera y recordándola durante el rango."""
+        if block_number not in self._timestamps:
+            self._timestamps[block_number] = (await w3.eth.get_block(block_number)).timestamp
+        return analysis.block_day(self._timestamps[block_number])
+
+    async def _process_tx(self, w3: AsyncWeb3, tx_hash, accumulators):
+        """Suma una transacción externa en la que alguna wallet es emisor o receptor."""
+        tx, receipt = await asyncio.gather(w3.eth.get_transaction(tx_hash), w3.eth.get_transaction_receipt(tx_hash))
+        analysis.accumulate_tx(accumulators, tx, receipt, await self._time_block(w3, tx.blockNumber))
+
+    async def _process_token_logs(self, w3, start_block, end_block, accumulators):
+        """Pide en paralelo los Transfer del rango filtrando por emisor y por receptor."""
+        queries = []
+        for address in accumulators:
+            topic = _address_topic(address)
+            queries += [[analysis.TRANSFER_SIG, topic], [analysis.TRANSFER_SIG, None, topic]]
+        results = await asyncio.gather(*(
+            w3.eth.get_logs({"fromBlock": start_block, "toBlock": end_block, "topics": topics}) for topics in queries
+        ))
+        for logs in results:
+            await self._process_transfer_logs(w3, logs, accumulators)
+
+    @staticmethod
+    async def _process_transfer_logs(w3: AsyncWeb3, logs, accumulators):
+        """Versión asíncrona de `analysis.process_transfer_logs`."""
+        token_kinds = {}
+        for log in logs:
+            wallets = analysis.transfer_log_wallets(log, accumulators)
+            if not wallets:
+                continue
+            log_address = w3.to_checksum_address(log['address'])
+            if log_address not in token_kinds:
+                token_kinds[log_address] = await async_analysis._token_kind(w3, log_address, log['blockNumber'])
+            analysis.accumulate_token(accumulators, wallets, log_address, token_kinds[log_address])
+
+
+class AsyncTraceFilterBackend(AsyncAddressHistoryBackend):
+    """Versión asíncrona de `history.TraceFilterBackend`."""
+
+    name = "trace"
+
+    async def is_available(self, w3: AsyncWeb3) -> bool:
+        try:
+            await w3.manager.coro_request("trace_filter", [{"fromBlock": "0x0", "toBlock": "0x0", "count": 1}])
+            return True
+        except Exception:
+            return False
+
+    async def _traces(self, w3: AsyncWeb3, start_block: int, end_block: int, field: str, address: str) -> List:
+        """Todas las trazas del rango con la dirección en `field`, paginando con after/count."""
+        traces, after = [], 0
+        while True:
+            page = await w3.manager.coro_request("trace_filter", [{
+                "fromBlock": hex(start_block), "toBlock": hex(end_block),
+                field: [address.lower()], "after": after, "count": HISTORY_PAGE_SIZE
+            }])
+            traces.extend(page)
+            if len(page) < HISTORY_PAGE_SIZE:
+                return traces
+            after += len(page)
+
+    async def _process_history(self, w3, start_block, end_block, accumulators):
+        queries = [(address, field) for address in accumulators for field in ("fromAddress", "toAddress")]
+        results = await asyncio.gather(*(
+            self._traces(w3, start_block, end_block, field, address) for address, field in queries
+        ))
+
+        seen = set()
+        top_level, internal = [], []
+        for traces in results:
+            for trace in traces:
+                tx_hash = trace.get("transactionHash")
+                # las recompensas de bloque no pertenecen a ninguna transacción
+                if not tx_hash:
+                    continue
+                key = (tx_hash, tuple(trace.get("traceAddress") or []))
+                if key in seen:
+                    continue
+                seen.add(key)
+
+                if not trace.get("traceAddress"):
+                    top_level.append(tx_hash)
+                elif not trace.get("error"):
+                    internal.append(trace)
+
+        for trace in internal:
+            await self._process_internal_trace(w3, trace, accumulators)
+        await _run_limited(
+            lambda tx_hash: self._process_tx(w3, tx_hash, accumulators), dict.fromkeys(top_level)
+        )
+
+    async def _process_internal_trace(self, w3: AsyncWeb3, trace, accumulators):
+        action = trace.get("action") or {}
+        block_number = _to_int(trace.get("blockNumber"))
+        sender = Web3.to_checksum_address(action["from"]) if action.get("from") else None
+
+        if trace.get("type") == "create":
+            created = (trace.get("result") or {}).get("address")
+            if created:
+                analysis.accumulate_created_contract(accumulators, sender, Web3.to_checksum_address(created))
+            return
+
+        if trace.get("type") == "call" and _to_int(action.get("value")) > 0:
+            receiver = Web3.to_checksum_address(action["to"]) if action.get("to") else None
+            analysis.accumulate_internal(accumulators, sender, receiver, await self._time_block(w3, block_number))
+
+
+class AsyncOtterscanBackend(AsyncAddressHistoryBackend):
+    """Versión asíncrona de `history.OtterscanBackend`; las transacciones de cada página se resuelven en paralelo."""
+
+    name = "otterscan"
+
+    # tipos de `ots_getInternalOperations`
+    OP_TRANSFER, OP_SELF_DESTRUCT, OP_CREATE, OP_CREATE2 = 0, 1, 2, 3
+
+    async def is_available(self, w3: AsyncWeb3) -> bool:
+        try:
+            return _to_int(await w3.manager.coro_request("ots_getApiLevel", [])) >= 8
+        except Exception:
+            return False
+
+    async def _process_history(self, w3, start_block, end_block, accumulators):
+        for address in accumulators:
+            # la búsqueda es estrictamente posterior al bloque dado (ver `history.OtterscanBackend`)
+            cursor = max(start_block - 1, 0)
+            while cursor < end_block:
+                page = await w3.manager.coro_request(
+                    "ots_searchTransactionsAfter", [address, cursor, HISTORY_PAGE_SIZE]
+                )
+                txs = page.get("txs") or []
+                blocks = [_to_int(tx["blockNumber"]) for tx in txs]
+                in_range = [tx for tx, block_number in zip(txs, blocks) if start_block <= block_number <= end_block]
+                await _run_limited(lambda tx: self._process_ots_tx(w3, tx, address, accumulators), in_range)
+                # los resultados van de más reciente a más antiguo: `firstPage` indica que no hay
+                # transacciones más recientes, y pasado `end_block` ya no quedan del rango
+                if not txs or page.get("firstPage") or max(blocks) >= end_block or max(blocks) <= cursor:
+                    break
+                cursor = max(blocks)
+
+    async def _process_ots_tx(self, w3: AsyncWeb3, tx, address: str, accumulators):
+        tx_from = Web3.to_checksum_address(tx["from"])
+        tx_to = Web3.to_checksum_address(tx["to"]) if tx.get("to") else None
+        # una transacción entre dos wallets seguidas aparece en ambos historiales, pero se suma una vez
+        if address in (tx_from, tx_to) and tx["hash"] not in self._processed:
+            self._processed.add(tx["hash"])
+            await self._process_tx(w3, tx["hash"], accumulators)
+        time_block = None
+
+        for op in await w3.manager.coro_request("ots_getInternalOperations", [tx["hash"]]) or []:
+            sender = Web3.to_checksum_address(op["from"])
+            receiver = Web3.to_checksum_address(op["to"])
+            if address not in (sender, receiver):
+                continue
+            op_type = _to_int(op.get("type"))
+            if op_type in (self.OP_CREATE, self.OP_CREATE2):
+                analysis.accumulate_created_contract({address: accumulators[address]}, sender, receiver)
+            elif op_type == self.OP_TRANSFER:
+                time_block = time_block or await self._time_block(w3, _to_int(tx["blockNumber"]))
+                analysis.accumulate_internal({address: accumulators[address]}, sender, receiver, time_block)
+
+
+ASYNC_HISTORY_BACKENDS = {backend.name: backend for backend in (AsyncTraceFilterBackend, AsyncOtterscanBackend)}
+
+# clase de backend detectada para cada nodo (None si solo queda escanear bloques), como en `history`
+_detected_backends: Dict[str, Optional[type]] = {}
+
+
+async def get_history_backend(w3: AsyncWeb3) -> Optional[AsyncAddressHistoryBackend]:
+    """
+    Versión asíncrona de `history.get_history_backend`, resuelta una sola vez por endpoint.
+
+    Devuelve una instancia nueva del backend por dirección, o None si hay que escanear
+    bloques: porque el nodo no ofrece ninguno o porque el backend pedido en
+    HISTORY_BACKEND (la bisección) no tiene versión asíncrona.
+    """
+    if HISTORY_BACKEND != "auto":
+        backend_class = ASYNC_HISTORY_BACKENDS.get(HISTORY_BACKEND)
+        return backend_class() if backend_class else None
+
+    key = getattr(w3.provider, "endpoint_uri", None) or str(id(w3.provider))
+    if key not in _detected_backends:
+        detected = None
+        for backend_class in ASYNC_HISTORY_BACKENDS.values():
+            if await backend_class().is_available(w3):
+                detected = backend_class
+                break
+        _detected_backends[key] = detected
+    backend_class = _detected_backends[key]
+    return backend_class() if backend_class else None
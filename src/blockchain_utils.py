@@ -1,12 +1,29 @@
 # src/blockchain_utils.py
-from web3 import Web3
-import streamlit as st 
-from src.config import METRIC_KEYS_ORDER, CONTRACT_ABI
+import asyncio
+import logging
+import requests
+from web3 import Web3, AsyncWeb3
+from src.config import METRIC_KEYS_ORDER, CONTRACT_ABI, RPC_POOL_SIZE
+from src.rate_limit import RateLimitedHTTPProvider, RateLimitedAsyncHTTPProvider
 
-def connect_to_node(rpc_url):
-    """Intenta conectar a un nodo Ethereum y devuelve una instancia de Web3."""
+logger = logging.getLogger(__name__)
+
+def _new_http_session(pool_size: int) -> requests.Session:
+    """Crea una sesión HTTP propia con un pool de conexiones del tamaño indicado."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def connect_to_node(rpc_url, pool_size: int = RPC_POOL_SIZE):
+    """
+    Intenta conectar a un nodo Ethereum y devuelve una instancia de Web3.
+
+    Las peticiones pasan por el limitador compartido del endpoint (ver `src.rate_limit`).
+    """
     try:
-        w3 = Web3(Web3.HTTPProvider(rpc_url))
+        w3 = Web3(RateLimitedHTTPProvider(rpc_url, session=_new_http_session(pool_size)))
         if w3.is_connected():
             return w3
     except Exception:
@@ -32,7 +49,7 @@ def get_cached_data_from_contract(contract, wallet_address):
         cached_metrics = dict(zip(METRIC_KEYS_ORDER, metrics_tuple))
         return cached_metrics, last_block
     except Exception as e:
-        st.error(f"Error al leer del contrato: {e}")
+        logger.error(f"Error al leer del contrato: {e}")
         return None, 0
 
 def update_data_in_contract(w3: Web3, contract, owner_address, private_key, wallet_to_update, metrics_dict, new_block_number):
@@ -52,10 +69,65 @@ def update_data_in_contract(w3: Web3, contract, owner_address, private_key, wall
         })
         signed_tx = w3.eth.account.sign_transaction(tx_data, private_key=private_key)
         tx_hash = w3.eth.send_raw_transaction(signed_tx.raw_transaction)
-        st.info(f"Enviando transacción de actualización... Hash: {tx_hash.hex()}")
+        logger.info(f"Enviando transacción de actualización... Hash: {tx_hash.hex()}")
         tx_receipt = w3.eth.wait_for_transaction_receipt(tx_hash)
         return tx_receipt
 
     except Exception as e:
-        st.error(f"Error al actualizar el contrato: {e}")
-        return None
\ No newline at end of file
+        logger.error(f"Error al actualizar el contrato: {e}")
+        return None
+
+
+# !--- Variantes asíncronas, usadas por el endpoint async de la API ---
+
+# serializa la obtención del nonce y el envío de las actualizaciones del owner entre peticiones concurrentes
+_owner_tx_lock = None
+
+def build_async_connection(rpc_url: str, contract_address: str):
+    """Crea una instancia de AsyncWeb3 y del contrato para el mismo nodo y dirección."""
+    async_w3 = AsyncWeb3(RateLimitedAsyncHTTPProvider(rpc_url))
+    if not CONTRACT_ABI:
+        return async_w3, None
+    contract = async_w3.eth.contract(address=Web3.to_checksum_address(contract_address), abi=CONTRACT_ABI)
+    return async_w3, contract
+
+async def async_get_cached_data_from_contract(contract, wallet_address):
+    """Versión asíncrona de `get_cached_data_from_contract`."""
+    try:
+        metrics_tuple, last_block = await contract.functions.getWalletData(wallet_address).call()
+        if last_block == 0:
+            return None, 0
+        cached_metrics = dict(zip(METRIC_KEYS_ORDER, metrics_tuple))
+        return cached_metrics, last_block
+    except Exception as e:
+        logger.error(f"Error al leer del contrato: {e}")
+        return None, 0
+
+async def async_update_data_in_contract(w3: AsyncWeb3, contract, owner_address, private_key, wallet_to_update, metrics_dict, new_block_number):
+    """Versión asíncrona de `update_data_in_contract`."""
+    global _owner_tx_lock
+    if _owner_tx_lock is None:
+        _owner_tx_lock = asyncio.Lock()
+
+    try:
+        metrics_tuple = [metrics_dict[key] for key in METRIC_KEYS_ORDER]
+        owner = Web3.to_checksum_address(owner_address)
+        async with _owner_tx_lock:
+            tx_data = await contract.functions.updateWalletData(
+                Web3.to_checksum_address(wallet_to_update),
+                metrics_tuple,
+                new_block_number
+            ).build_transaction({
+                'from': owner,
+                'nonce': await w3.eth.get_transaction_count(owner, 'pending'),
+                'gas': 2000000,
+                'gasPrice': await w3.eth.gas_price
+            })
+            signed_tx = w3.eth.account.sign_transaction(tx_data, private_key=private_key)
+            tx_hash = await w3.eth.send_raw_transaction(signed_tx.raw_transaction)
+        logger.info(f"Enviando transacción de actualización... Hash: {tx_hash.hex()}")
+        return await w3.eth.wait_for_transaction_receipt(tx_hash)
+
+    except Exception as e:
+        logger.error(f"Error al actualizar el contrato: {e}")
+        return None
@@ -0,0 +1,75 @@
+# src/bloom.py
+from typing import Dict, Iterable
+from web3 import Web3
+
+# Filtro de Bloom de los logs de un bloque (logsBloom, 2048 bits): contiene la dirección
+# emisora y cada topic de todos los logs del bloque. Si un elemento no está en el filtro,
+# seguro que ningún log del bloque lo incluye; si está, puede ser un falso positivo.
+
+BLOOM_BYTES = 256
+
+
+def _to_bytes(bloom) -> bytes:
+    """Normaliza el logsBloom (HexBytes, hex o entero según el nodo) a 256 bytes."""
+    if isinstance(bloom, int):
+        return bloom.to_bytes(BLOOM_BYTES, "big")
+    if isinstance(bloom, str):
+        digits = bloom[2:] if bloom.startswith("0x") else bloom
+        return bytes.fromhex(digits.rjust(BLOOM_BYTES * 2, "0"))
+    return bytes(bloom).rjust(BLOOM_BYTES, b"\0")
+
+
+def bloom_contains(bloom, item: bytes) -> bool:
+    """Indica si `item` (dirección o topic) puede estar en el filtro, según el Yellow Paper."""
+    bloom = _to_bytes(bloom)
+    digest = Web3.keccak(item)
+    for i in (0, 2, 4):
+        bit = ((digest[i] << 8) | digest[i + 1]) & 2047
+        if not bloom[BLOOM_BYTES - 1 - bit // 8] & (1 << (bit % 8)):
+            return False
+    return True
+
+
+def may_contain_transfer_for(bloom, transfer_topic: str, wallets: Iterable[str]) -> bool:
+    """Indica si el bloque puede tener un Transfer en el que participe alguna de las wallets."""
+    bloom = _to_bytes(bloom)
+    if not any(bloom) or not bloom_contains(bloom, bytes.fromhex(transfer_topic[2:])):
+        return False
+    # en un Transfer la wallet aparece como topic indexado, rellenada a 32 bytes
+    return any(bloom_contains(bloom, bytes.fromhex(wallet[2:]).rjust(32, b"\0")) for wallet in wallets)
+
+
+class BloomStats:
+    """Contadores del prefiltrado: bloques revisados, aciertos del filtro y falsos positivos."""
+
+    def __init__(self):
+        self.blocks_checked = 0
+        self.bloom_hits = 0
+        self.false_positives = 0
+
+    def record(self, hit: bool, relevant: bool = False):
+        """Registra un bloque: si el filtro dio positivo y si los logs resultaron relevantes."""
+        self.blocks_checked += 1
+        if hit:
+            self.bloom_hits += 1
+            if not relevant:
+                self.false_positives += 1
+
+    @property
+    def calls_saved(self) -> int:
+        """Llamadas a get_logs evitadas frente a pedir los logs de cada bloque."""
+        return self.blocks_checked - self.bloom_hits
+
+    @property
+    def false_positive_rate(self) -> float:
+        """Fracción de aciertos del filtro cuyos logs no involucraban a ninguna wallet."""
+        return self.false_positives / self.bloom_hits if self.bloom_hits else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            "blocks_checked": self.blocks_checked,
+            "bloom_hits": self.bloom_hits,
+            "false_positives": self.false_positives,
+            "false_positive_rate": round(self.false_positive_rate, 4),
+            "get_logs_calls_saved": self.calls_saved,
+        }
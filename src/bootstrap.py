@@ -0,0 +1,208 @@
+# src/bootstrap.py
+import os
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterator, List, Tuple
+from web3 import Web3
+
+from src import blockchain_utils
+from src.cache import wallet_cache
+from src.config import (
+    METRIC_KEYS_ORDER, CACHE_CHECKPOINT_PATH, CACHE_CHECKPOINT_INTERVAL, CACHE_BOOTSTRAP_FROM_BLOCK,
+    CACHE_BOOTSTRAP_BLOCK_RANGE, CACHE_BOOTSTRAP_BATCH_SIZE
+)
+
+# Precarga de la caché en memoria tras un reinicio: en vez de un getWalletData por wallet
+# cuando llega cada petición, se recorren los eventos WalletDataUpdated del contrato en rangos
+# grandes, se leen por lotes los datos de las wallets que aparecen y se cargan en `wallet_cache`.
+# El checkpoint guarda el último bloque de eventos leído y los datos ya cargados, así que en el
+# siguiente arranque solo se leen los eventos y las wallets nuevas. También guarda los histogramas
+# diarios de la caché, que no están en el contrato, para no perderlos al reiniciar.
+
+logger = logging.getLogger(__name__)
+
+WALLET_DATA_UPDATED_SIG = "0x" + Web3.keccak(text="WalletDataUpdated(address,uint256)").hex()
+
+# estado de la última precarga, expuesto en /ready
+bootstrap_status = {"state": "idle", "wallets": 0, "last_block": None}
+
+
+def load_checkpoint(path: str, contract_address: str, chain_id: int) -> Dict:
+    """Carga el checkpoint si corresponde al mismo contrato y cadena; si no, empieza de cero."""
+    empty = {"last_block": CACHE_BOOTSTRAP_FROM_BLOCK - 1, "wallets": {}, "daily": {}}
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return empty
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"Checkpoint de la caché ilegible en {path}, se ignora: {e}")
+        return empty
+
+    if checkpoint.get("contract") != contract_address or checkpoint.get("chain_id") != chain_id:
+        logger.info("El checkpoint de la caché es de otro contrato o cadena, se ignora.")
+        return empty
+    return {"last_block": checkpoint["last_block"], "wallets": checkpoint["wallets"], "daily": checkpoint.get("daily", {})}
+
+
+def daily_to_save(saved: Dict) -> Dict:
+    """Histogramas del checkpoint `saved` actualizados con los más recientes de la caché en memoria."""
+    daily = dict(saved)
+    for wallet, entry in wallet_cache.daily_histograms().items():
+        if wallet not in daily or daily[wallet]["last_block"] < entry["last_block"]:
+            daily[wallet] = entry
+    return daily
+
+
+def save_checkpoint(path: str, contract_address: str, chain_id: int, last_block: int, wallets: Dict, daily: Dict):
+    """Guarda el checkpoint de forma atómica (varios workers pueden compartir el archivo)."""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    checkpoint = {
+        "contract": contract_address, "chain_id": chain_id, "last_block": last_block,
+        "wallets": wallets, "daily": daily
+    }
+    try:
+        with open(tmp_path, "w") as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"No se pudo guardar el checkpoint de la caché en {path}: {e}")
+
+
+def iter_wallet_updates(
+    w3: Web3,
+    contract_address: str,
+    from_block: int,
+    to_block: int,
+    block_range: int = CACHE_BOOTSTRAP_BLOCK_RANGE
+) -> Iterator[Tuple[int, Dict[str, int]]]:
+    """
+    Recorre los eventos WalletDataUpdated en rangos de `block_range` bloques.
+
+    Por cada rango devuelve (último bloque del rango, {wallet: mayor lastBlock emitido}).
+    Si el nodo rechaza un rango (demasiados resultados, timeout), se reintenta con la mitad.
+    """
+    start = from_block
+    while start <= to_block:
+        end = min(start + block_range - 1, to_block)
+        try:
+            logs = w3.eth.get_logs({
+                "address": contract_address,
+                "fromBlock": start,
+                "toBlock": end,
+                "topics": [WALLET_DATA_UPDATED_SIG],
+            })
+        except Exception as e:
+            if end == start:
+                raise
+            block_range = max(1, (end - start + 1) // 2)
+            logger.info(f"Rango de eventos {start}-{end} rechazado ({e}); se reduce a {block_range} bloques.")
+            continue
+
+        updates = {}
+        for log in logs:
+            wallet = Web3.to_checksum_address(bytes(log["topics"][1])[-20:])
+            last_block = int.from_bytes(bytes(log["data"])[:32], "big")
+            updates[wallet] = max(last_block, updates.get(wallet, 0))
+        yield end, updates
+        start = end + 1
+
+
+def read_wallets(w3: Web3, contract, wallets: List[str], batch_size: int = CACHE_BOOTSTRAP_BATCH_SIZE) -> Dict[str, Tuple[Dict, int]]:
+    """
+    Lee getWalletData de varias wallets agrupando las llamadas en peticiones JSON-RPC por lotes.
+
+    Si el nodo no admite lotes, recurre a una llamada por wallet.
+    """
+    results = {}
+    for i in range(0, len(wallets), batch_size):
+        chunk = wallets[i:i + batch_size]
+        try:
+            with w3.batch_requests() as batch:
+                for wallet in chunk:
+                    batch.add(contract.functions.getWalletData(wallet))
+                responses = batch.execute()
+            for wallet, (metrics_tuple, last_block) in zip(chunk, responses):
+                if last_block:
+                    results[wallet] = (dict(zip(METRIC_KEYS_ORDER, metrics_tuple)), last_block)
+        except Exception as e:
+            logger.info(f"Lectura por lotes no disponible ({e}); se lee wallet a wallet.")
+            for wallet in chunk:
+                metrics, last_block = blockchain_utils.get_cached_data_from_contract(contract, wallet)
+                if metrics:
+                    results[wallet] = (metrics, last_block)
+    return results
+
+
+def bootstrap_wallet_cache(w3: Web3, contract, checkpoint_path: str = CACHE_CHECKPOINT_PATH) -> int:
+    """
+    Carga en `wallet_cache` todas las wallets cacheadas en el contrato y devuelve cuántas hay.
+
+    Se reanuda desde el checkpoint: lo ya guardado se carga sin llamadas RPC y solo se
+    vuelven a leer las wallets con eventos posteriores a sus datos guardados. Cada escritura
+    reescribe el archivo completo, así que durante el recorrido se guarda como mucho una vez
+    cada CACHE_CHECKPOINT_INTERVAL segundos, y siempre al terminar.
+    """
+    contract_address = contract.address
+    chain_id = w3.eth.chain_id
+    head = w3.eth.block_number
+    checkpoint = load_checkpoint(checkpoint_path, contract_address, chain_id)
+    wallets = checkpoint["wallets"]
+
+    bootstrap_status.update(state="running", wallets=len(wallets), last_block=checkpoint["last_block"])
+    for wallet, entry in wallets.items():
+        wallet_cache.set(wallet, entry["metrics"], entry["last_block"])
+    for wallet, entry in checkpoint["daily"].items():
+        wallet_cache.restore_daily(wallet, entry["days"], entry["since"], entry["last_block"])
+
+    last_saved = time.monotonic()
+    for range_end, updates in iter_wallet_updates(w3, contract_address, checkpoint["last_block"] + 1, head):
+        stale = [
+            wallet for wallet, last_block in updates.items()
+            if wallet not in wallets or wallets[wallet]["last_block"] < last_block
+        ]
+        for wallet, (metrics, last_block) in read_wallets(w3, contract, stale).items():
+            wallets[wallet] = {"metrics": metrics, "last_block": last_block}
+            wallet_cache.set(wallet, metrics, last_block)
+
+        if updates and time.monotonic() - last_saved >= CACHE_CHECKPOINT_INTERVAL:
+            save_checkpoint(
+                checkpoint_path, contract_address, chain_id, range_end, wallets, daily_to_save(checkpoint["daily"])
+            )
+            last_saved = time.monotonic()
+        bootstrap_status.update(wallets=len(wallets), last_block=range_end)
+
+    save_checkpoint(checkpoint_path, contract_address, chain_id, head, wallets, daily_to_save(checkpoint["daily"]))
+    bootstrap_status.update(state="done", wallets=len(wallets), last_block=head)
+    logger.info(f"Caché precargada con {len(wallets)} wallets hasta el bloque {head}.")
+    return len(wallets)
+
+
+def save_daily_histograms(w3: Web3, contract, checkpoint_path: str = CACHE_CHECKPOINT_PATH):
+    """
+    Guarda en el checkpoint los histogramas diarios de la caché (al cerrar la API).
+
+    Se vuelve a leer el checkpoint por si otro worker lo actualizó, y de cada wallet
+    se conserva el histograma que llega a un bloque más reciente.
+    """
+    chain_id = w3.eth.chain_id
+    checkpoint = load_checkpoint(checkpoint_path, contract.address, chain_id)
+    daily = daily_to_save(checkpoint["daily"])
+    save_checkpoint(checkpoint_path, contract.address, chain_id, checkpoint["last_block"], checkpoint["wallets"], daily)
+    logger.info(f"Histogramas diarios de {len(daily)} wallets guardados en {checkpoint_path}.")
+
+
+def start_bootstrap(w3: Web3, contract) -> threading.Thread:
+    """Lanza la precarga en un hilo para no retrasar el arranque de la API."""
+    def run():
+        try:
+            bootstrap_wallet_cache(w3, contract)
+        except Exception as e:
+            bootstrap_status["state"] = "failed"
+            logger.error(f"Error al precargar la caché desde los eventos del contrato: {e}")
+
+    thread = threading.Thread(target=run, daemon=True, name="cache-bootstrap")
+    thread.start()
+    return thread
@@ -0,0 +1,127 @@
+# src/cache.py
+import threading
+from typing import Dict, List, Optional, Tuple
+
+
+class WalletCache:
+    """
+    Caché en memoria del proceso con las métricas más recientes de cada wallet.
+
+    Complementa a la caché on-chain del contrato: evita una llamada a
+    `getWalletData` por análisis y es donde la watchlist deja sus
+    actualizaciones incrementales. Es segura para usarse desde varios hilos.
+
+    Además guarda el histograma diario de cada wallet (ver `analysis.new_accumulators`),
+    con el que se calculan métricas por ventanas de días sin llamadas RPC. El
+    histograma no está en el contrato, así que cubre la actividad desde `since`
+    (día del primer bloque analizado, o None si es desde el génesis). Se conserva
+    entre reinicios en el checkpoint de la precarga y en los snapshots.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Dict] = {}
+        self._daily: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, wallet_address: str) -> Tuple[Optional[Dict], int]:
+        """Devuelve (métricas, último bloque) de la wallet, o (None, 0) si no está en caché."""
+        with self._lock:
+            entry = self._entries.get(wallet_address)
+            if not entry:
+                return None, 0
+            return dict(entry["metrics"]), entry["last_block"]
+
+    def set(self, wallet_address: str, metrics: Dict, last_block: int):
+        """Guarda las métricas de la wallet si son al menos tan recientes como las almacenadas."""
+        with self._lock:
+            entry = self._entries.get(wallet_address)
+            if entry and entry["last_block"] > last_block:
+                return
+            self._entries[wallet_address] = {"metrics": dict(metrics), "last_block": last_block}
+
+    def replace(self, wallet_address: str, metrics: Dict, last_block: int, expected_last_block: int) -> bool:
+        """
+        Guarda las métricas solo si el último bloque en caché sigue siendo `expected_last_block`.
+
+        Sirve para sumar un tramo nuevo a unas métricas leídas antes sin pisar otro análisis
+        que haya avanzado la caché mientras tanto. Devuelve False si la caché cambió.
+        """
+        with self._lock:
+            entry = self._entries.get(wallet_address)
+            if not entry or entry["last_block"] != expected_last_block:
+                return False
+            self._entries[wallet_address] = {"metrics": dict(metrics), "last_block": last_block}
+            return True
+
+    def remove(self, wallet_address: str):
+        """Elimina la wallet de la caché."""
+        with self._lock:
+            self._entries.pop(wallet_address, None)
+            self._daily.pop(wallet_address, None)
+
+    def get_daily(self, wallet_address: str) -> Tuple[Optional[Dict], Optional[str], int]:
+        """Devuelve (histograma diario, día desde el que cubre, último bloque), o (None, None, 0)."""
+        with self._lock:
+            entry = self._daily.get(wallet_address)
+            if not entry:
+                return None, None, 0
+            return {day: list(row) for day, row in entry["days"].items()}, entry["since"], entry["last_block"]
+
+    def set_daily(self, wallet_address: str, days: Dict, since: Optional[str], last_block: int):
+        """Reemplaza el histograma diario de la wallet."""
+        with self._lock:
+            self._daily[wallet_address] = {
+                "days": {day: list(row) for day, row in days.items()}, "since": since, "last_block": last_block
+            }
+
+    def restore_daily(self, wallet_address: str, days: Dict, since: Optional[str], last_block: int):
+        """Carga un histograma guardado (checkpoint o snapshot) si es más reciente que el de la caché."""
+        with self._lock:
+            entry = self._daily.get(wallet_address)
+            if entry and entry["last_block"] >= last_block:
+                return
+            self._daily[wallet_address] = {
+                "days": {day: list(row) for day, row in days.items()}, "since": since, "last_block": last_block
+            }
+
+    def daily_histograms(self) -> Dict[str, Dict]:
+        """Copia de todos los histogramas, como {wallet: {"days", "since", "last_block"}}, para guardarlos."""
+        with self._lock:
+            return {
+                wallet: {
+                    "days": {day: list(row) for day, row in entry["days"].items()},
+                    "since": entry["since"],
+                    "last_block": entry["last_block"]
+                }
+                for wallet, entry in self._daily.items()
+            }
+
+    def extend_daily(self, wallet_address: str, days: Dict, from_block: int, to_block: int) -> bool:
+        """
+        Suma al histograma guardado el de los bloques `from_block`-`to_block`.
+
+        Solo lo hace si continúa justo donde acaba el guardado; si no, devuelve False.
+        """
+        with self._lock:
+            entry = self._daily.get(wallet_address)
+            if not entry or entry["last_block"] + 1 != from_block:
+                return False
+            for day, row in days.items():
+                target = entry["days"].setdefault(day, [0] * len(row))
+                for i, value in enumerate(row):
+                    target[i] += value
+            entry["last_block"] = to_block
+            return True
+
+    def wallets(self) -> List[str]:
+        """Lista las wallets presentes en la caché."""
+        with self._lock:
+            return list(self._entries)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+# instancia compartida por el análisis, la watchlist y la API
+wallet_cache = WalletCache()
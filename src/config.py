@@ -19,9 +19,70 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONTRACT_JSON_PATH = os.path.join(BASE_DIR, 'contracts', 'walletDataCache.sol', 'WalletDataCache.json')
 
 # ! --- Variables de Entorno ---
-# OWNER_ADDRESS_ENV = os.getenv("OWNER_ADDRESS", "")
+OWNER_ADDRESS_ENV = os.getenv("OWNER_ADDRESS", "")
 OWNER_PRIVATE_KEY = os.getenv("OWNER_PRIVATE_KEY")
-# CONTRACT_ADDRESS_ENV = os.getenv("CONTRACT_ADDRESS", "")
+CONTRACT_ADDRESS_ENV = os.getenv("CONTRACT_ADDRESS", "")
+# Nodo al que se conecta la API al arrancar sin la interfaz de Streamlit
+RPC_URL_ENV = os.getenv("RPC_URL", "")
+
+# Servidor de la API independiente (server.py). Cada worker abre su propio pool de conexiones al RPC.
+API_HOST = os.getenv("API_HOST", "0.0.0.0")
+API_PORT = int(os.getenv("API_PORT", "8000"))
+API_WORKERS = int(os.getenv("API_WORKERS", "1"))
+RPC_POOL_SIZE = int(os.getenv("RPC_POOL_SIZE", "20"))
+# Si es "0", app.py no levanta la API en un hilo (por ejemplo, si ya corre server.py)
+EMBEDDED_API = os.getenv("EMBEDDED_API", "1") != "0"
+
+# Número de bloques procesados entre cada actualización de progreso del análisis
+PROGRESS_CHUNK_SIZE = int(os.getenv("PROGRESS_CHUNK_SIZE", "100"))
+
+# Máximo de bloques leídos en paralelo por cada análisis asíncrono
+ASYNC_BLOCK_CONCURRENCY = int(os.getenv("ASYNC_BLOCK_CONCURRENCY", "16"))
+
+# Backend de historial: "auto" (detecta trace_filter u Otterscan y si no escanea bloques),
+# "trace", "otterscan", "scan" o "bisect" (bisección aproximada sobre el estado de archivo, solo bajo demanda)
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "auto")
+# Resultados por página al paginar trace_filter / ots_searchTransactionsAfter
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "500"))
+
+# Segundos entre consultas de nuevos bloques para las wallets en seguimiento (watchlist)
+WATCHLIST_POLL_INTERVAL = float(os.getenv("WATCHLIST_POLL_INTERVAL", "2"))
+
+# Precarga de la caché en memoria al arrancar la API, a partir de los eventos WalletDataUpdated del contrato.
+# Si es "0" no se precarga.
+CACHE_BOOTSTRAP = os.getenv("CACHE_BOOTSTRAP", "1") != "0"
+# Archivo de checkpoint para reanudar la precarga desde el último bloque de eventos leído
+CACHE_CHECKPOINT_PATH = os.getenv("CACHE_CHECKPOINT_PATH", os.path.join(BASE_DIR, "cache_checkpoint.json"))
+# Segundos mínimos entre escrituras del checkpoint durante la precarga; al terminar siempre se guarda
+CACHE_CHECKPOINT_INTERVAL = float(os.getenv("CACHE_CHECKPOINT_INTERVAL", "30"))
+# Bloque desde el que buscar eventos sin checkpoint (ej. el bloque de despliegue del contrato)
+CACHE_BOOTSTRAP_FROM_BLOCK = int(os.getenv("CACHE_BOOTSTRAP_FROM_BLOCK", "0"))
+# Bloques por consulta de eventos y wallets por lote de lecturas de getWalletData
+CACHE_BOOTSTRAP_BLOCK_RANGE = int(os.getenv("CACHE_BOOTSTRAP_BLOCK_RANGE", "10000"))
+CACHE_BOOTSTRAP_BATCH_SIZE = int(os.getenv("CACHE_BOOTSTRAP_BATCH_SIZE", "100"))
+
+# Snapshots Parquet de las métricas (requieren pyarrow). Si SNAPSHOT_IMPORT_PATH apunta a un
+# snapshot, la API lo carga en la caché al arrancar.
+SNAPSHOT_IMPORT_PATH = os.getenv("SNAPSHOT_IMPORT_PATH", "")
+# Wallets por grupo de filas al escribir y por lote al leer
+SNAPSHOT_CHUNK_SIZE = int(os.getenv("SNAPSHOT_CHUNK_SIZE", "10000"))
+
+# Limitador de peticiones RPC del lado del cliente, compartido por todas las conexiones del proceso
+# a un mismo endpoint (ver src/rate_limit.py). Con 0 no se limita ese presupuesto. Los presupuestos
+# son del despliegue completo: cada uno de los API_WORKERS procesos recibe su parte.
+RPC_MAX_RPS = float(os.getenv("RPC_MAX_RPS", "0"))
+RPC_MAX_CU_PER_SECOND = float(os.getenv("RPC_MAX_CU_PER_SECOND", "0"))
+# Máximo de peticiones en vuelo por endpoint; el control AIMD ajusta el límite real entre 1 y este valor
+RPC_MAX_CONCURRENCY = int(os.getenv("RPC_MAX_CONCURRENCY", "32"))
+# Latencia (segundos) a partir de la cual se reduce la concurrencia
+RPC_LATENCY_TARGET = float(os.getenv("RPC_LATENCY_TARGET", "2"))
+# Reintentos ante 429, timeouts y errores de límite del proveedor, con espera exponencial con jitter
+RPC_MAX_RETRIES = int(os.getenv("RPC_MAX_RETRIES", "6"))
+RPC_BACKOFF_BASE = float(os.getenv("RPC_BACKOFF_BASE", "0.5"))
+RPC_BACKOFF_MAX = float(os.getenv("RPC_BACKOFF_MAX", "30"))
+# Presupuestos por endpoint en JSON, por prefijo de URL, que sustituyen a los valores anteriores.
+# Ej: {"https://eth-mainnet.g.alchemy.com": {"rps": 25, "cu_per_second": 330, "max_concurrency": 8}}
+RPC_ENDPOINT_BUDGETS = json.loads(os.getenv("RPC_ENDPOINT_BUDGETS", "") or "{}")
 
 
 def load_contract_abi():
@@ -0,0 +1,359 @@
+# src/history.py
+from typing import Dict, Iterator, List, Tuple
+from web3 import Web3
+
+from src import analysis
+from src.bloom import BloomStats
+from src.config import HISTORY_BACKEND, HISTORY_PAGE_SIZE, PROGRESS_CHUNK_SIZE
+
+# Backends de historial: localizan la actividad de las wallets en un rango de bloques.
+# El escaneo de bloques funciona con cualquier nodo; los demás usan APIs de nodos de archivo
+# (Erigon, Nethermind, Reth, Otterscan) que devuelven directamente el historial de una dirección.
+# Bajo demanda, el estado de archivo (nonce y balance por bloque) localiza solo los bloques con actividad.
+
+
+def _to_int(value) -> int:
+    """Convierte un entero que el nodo puede devolver como número o como cadena hexadecimal."""
+    if isinstance(value, str):
+        return int(value, 16)
+    return int(value or 0)
+
+
+def _address_topic(address: str) -> str:
+    """Dirección rellenada a 32 bytes, como aparece en los topics indexados de un Transfer."""
+    return "0x" + address[2:].lower().rjust(64, "0")
+
+
+class HistoryBackend:
+    """Interfaz común de los backends de historial."""
+
+    name = "base"
+    # si es True, el análisis recorre el rango completo con `iter_range` en vez de tramo a tramo
+    scans_whole_range = False
+
+    def __init__(self):
+        # resultado del prefiltrado por logsBloom de los bloques leídos completos
+        self.bloom_stats = BloomStats()
+
+    def is_available(self, w3: Web3) -> bool:
+        """Indica si el nodo soporta las llamadas que necesita el backend."""
+        raise NotImplementedError
+
+    def process_range(self, w3: Web3, start_block: int, end_block: int, accumulators: Dict[str, Tuple[Dict, Dict]]):
+        """Acumula en `accumulators` la actividad de sus wallets entre `start_block` y `end_block`."""
+        raise NotImplementedError
+
+    def iter_range(
+        self,
+        w3: Web3,
+        start_block: int,
+        end_block: int,
+        accumulators: Dict[str, Tuple[Dict, Dict]],
+        chunk_size: int = PROGRESS_CHUNK_SIZE
+    ) -> Iterator[int]:
+        """
+        Como `process_range`, pero emite el último bloque procesado cada vez que se avanzan
+        al menos `chunk_size` bloques, y siempre `end_block` al terminar. Solo lo implementan
+        los backends con `scans_whole_range`.
+        """
+        raise NotImplementedError
+
+
+class BlockScanBackend(HistoryBackend):
+    """Lee cada bloque completo del rango. Funciona con cualquier nodo."""
+
+    name = "scan"
+
+    def is_available(self, w3: Web3) -> bool:
+        return True
+
+    def process_range(self, w3, start_block, end_block, accumulators):
+        for b in range(start_block, end_block + 1):
+            try:
+                analysis.process_block_for_wallets(w3, b, accumulators, bloom_stats=self.bloom_stats)
+            except Exception as e:
+                # el proveedor ya agotó sus reintentos: omitir el bloque dejaría métricas incompletas
+                raise RuntimeError(f"No se pudo procesar el bloque {b}: {e}") from e
+
+
+class _AddressHistoryBackend(HistoryBackend):
+    """Base de los backends que consultan el historial filtrado por dirección."""
+
+    def process_range(self, w3, start_block, end_block, accumulators):
+        self._timestamps = {}
+        self._processed = set()
+        self._process_history(w3, start_block, end_block, accumulators)
+        self._process_token_logs(w3, start_block, end_block, accumulators)
+
+    def _process_history(self, w3, start_block, end_block, accumulators):
+        raise NotImplementedError
+
+    def _time_block(self, w3: Web3, block_number: int) -> str:
+        """Día del bloque, leyendo solo la cabecera y recordándola durante el rango."""
+        if block_number not in self._timestamps:
+            self._timestamps[block_number] = w3.eth.get_block(block_number).timestamp
+        return analysis.block_day(self._timestamps[block_number])
+
+    def _process_tx(self, w3: Web3, tx_hash, accumulators):
+        """Suma una transacción externa en la que alguna wallet es emisor o receptor."""
+        tx = w3.eth.get_transaction(tx_hash)
+        receipt = w3.eth.get_transaction_receipt(tx_hash)
+        analysis.accumulate_tx(accumulators, tx, receipt, self._time_block(w3, tx.blockNumber))
+
+    def _process_token_logs(self, w3, start_block, end_block, accumulators):
+        """Pide los Transfer del rango filtrando por emisor y por receptor en vez de bloque a bloque."""
+        for address in accumulators:
+            topic = _address_topic(address)
+            for topics in ([analysis.TRANSFER_SIG, topic], [analysis.TRANSFER_SIG, None, topic]):
+                logs = w3.eth.get_logs({"fromBlock": start_block, "toBlock": end_block, "topics": topics})
+                analysis.process_transfer_logs(w3, logs, accumulators)
+
+
+class TraceFilterBackend(_AddressHistoryBackend):
+    """
+    Usa `trace_filter` (Erigon, Nethermind, Reth, OpenEthereum) con fromAddress/toAddress.
+
+    Además de las transacciones externas captura las transferencias internas de
+    valor y los contratos creados por la wallet desde otro contrato.
+    """
+
+    name = "trace"
+
+    def is_available(self, w3: Web3) -> bool:
+        try:
+            w3.manager.request_blocking("trace_filter", [{"fromBlock": "0x0", "toBlock": "0x0", "count": 1}])
+            return True
+        except Exception:
+            return False
+
+    def _traces(self, w3: Web3, start_block: int, end_block: int, field: str, address: str) -> List:
+        """Todas las trazas del rango con la dirección en `field`, paginando con after/count."""
+        traces, after = [], 0
+        while True:
+            page = w3.manager.request_blocking("trace_filter", [{
+                "fromBlock": hex(start_block), "toBlock": hex(end_block),
+                field: [address.lower()], "after": after, "count": HISTORY_PAGE_SIZE
+            }])
+            traces.extend(page)
+            if len(page) < HISTORY_PAGE_SIZE:
+                return traces
+            after += len(page)
+
+    def _process_history(self, w3, start_block, end_block, accumulators):
+        seen = set()
+        top_level = []
+        for address in accumulators:
+            for field in ("fromAddress", "toAddress"):
+                for trace in self._traces(w3, start_block, end_block, field, address):
+                    tx_hash = trace.get("transactionHash")
+                    # las recompensas de bloque no pertenecen a ninguna transacción
+                    if not tx_hash:
+                        continue
+                    key = (tx_hash, tuple(trace.get("traceAddress") or []))
+                    if key in seen:
+                        continue
+                    seen.add(key)
+
+                    if not trace.get("traceAddress"):
+                        top_level.append(tx_hash)
+                    elif not trace.get("error"):
+                        self._process_internal_trace(w3, trace, accumulators)
+
+        for tx_hash in dict.fromkeys(top_level):
+            self._process_tx(w3, tx_hash, accumulators)
+
+    def _process_internal_trace(self, w3: Web3, trace, accumulators):
+        action = trace.get("action") or {}
+        block_number = _to_int(trace.get("blockNumber"))
+        sender = Web3.to_checksum_address(action["from"]) if action.get("from") else None
+
+        if trace.get("type") == "create":
+            created = (trace.get("result") or {}).get("address")
+            if created:
+                analysis.accumulate_created_contract(accumulators, sender, Web3.to_checksum_address(created))
+            return
+
+        if trace.get("type") == "call" and _to_int(action.get("value")) > 0:
+            receiver = Web3.to_checksum_address(action["to"]) if action.get("to") else None
+            analysis.accumulate_internal(accumulators, sender, receiver, self._time_block(w3, block_number))
+
+
+class OtterscanBackend(_AddressHistoryBackend):
+    """
+    Usa `ots_searchTransactionsAfter` (Erigon con Otterscan) para paginar el historial de la dirección.
+
+    Las transacciones en las que la wallet no es emisor ni receptor se resuelven con
+    `ots_getInternalOperations` para contar las transferencias internas y creaciones.
+    """
+
+    name = "otterscan"
+
+    # tipos de `ots_getInternalOperations`
+    OP_TRANSFER, OP_SELF_DESTRUCT, OP_CREATE, OP_CREATE2 = 0, 1, 2, 3
+
+    def is_available(self, w3: Web3) -> bool:
+        try:
+            return _to_int(w3.manager.request_blocking("ots_getApiLevel", [])) >= 8
+        except Exception:
+            return False
+
+    def _process_history(self, w3, start_block, end_block, accumulators):
+        for address in accumulators:
+            # la búsqueda es estrictamente posterior al bloque dado; el génesis no tiene transacciones,
+            # así que desde el bloque 0 basta con buscar después de él
+            cursor = max(start_block - 1, 0)
+            while cursor < end_block:
+                page = w3.manager.request_blocking(
+                    "ots_searchTransactionsAfter", [address, cursor, HISTORY_PAGE_SIZE]
+                )
+                txs = page.get("txs") or []
+                # las páginas siempre incluyen bloques completos, así que se avanza por número de bloque
+                blocks = [_to_int(tx["blockNumber"]) for tx in txs]
+                for tx, block_number in zip(txs, blocks):
+                    if start_block <= block_number <= end_block:
+                        self._process_ots_tx(w3, tx, address, accumulators)
+                # los resultados van de más reciente a más antiguo: `firstPage` indica que no hay
+                # transacciones más recientes, y pasado `end_block` ya no quedan del rango
+                if not txs or page.get("firstPage") or max(blocks) >= end_block or max(blocks) <= cursor:
+                    break
+                cursor = max(blocks)
+
+    def _process_ots_tx(self, w3: Web3, tx, address: str, accumulators):
+        tx_from = Web3.to_checksum_address(tx["from"])
+        tx_to = Web3.to_checksum_address(tx["to"]) if tx.get("to") else None
+        # una transacción entre dos wallets seguidas aparece en ambos historiales, pero se suma una vez
+        if address in (tx_from, tx_to) and tx["hash"] not in self._processed:
+            self._processed.add(tx["hash"])
+            self._process_tx(w3, tx["hash"], accumulators)
+        time_block = None
+
+        for op in w3.manager.request_blocking("ots_getInternalOperations", [tx["hash"]]) or []:
+            sender = Web3.to_checksum_address(op["from"])
+            receiver = Web3.to_checksum_address(op["to"])
+            if address not in (sender, receiver):
+                continue
+            op_type = _to_int(op.get("type"))
+            if op_type in (self.OP_CREATE, self.OP_CREATE2):
+                analysis.accumulate_created_contract({address: accumulators[address]}, sender, receiver)
+            elif op_type == self.OP_TRANSFER:
+                time_block = time_block or self._time_block(w3, _to_int(tx["blockNumber"]))
+                analysis.accumulate_internal({address: accumulators[address]}, sender, receiver, time_block)
+
+
+class StateBisectionBackend(_AddressHistoryBackend):
+    """
+    Localiza los bloques con actividad bisecando el rango sobre el estado de las wallets.
+
+    Si el nonce y el balance coinciden en los extremos de un subrango se asume que
+    no hubo actividad; si difieren, se divide en dos hasta llegar a bloques sueltos.
+    El rango completo se biseca de una vez: con k bloques activos cuesta O(k·log N)
+    consultas de estado de archivo y solo se leen completos esos k bloques. Los
+    subrangos densos, donde bisecar costaría más que leerlos, se leen bloque a bloque.
+
+    Es una aproximación: no detecta transacciones entrantes sin valor ni movimientos
+    que se compensen exactamente dentro de un subrango, por eso solo se usa si se pide
+    con HISTORY_BACKEND=bisect. Los tokens se obtienen aparte con logs filtrados por dirección.
+    """
+
+    name = "bisect"
+    scans_whole_range = True
+
+    def is_available(self, w3: Web3) -> bool:
+        # un nodo sin estado de archivo no puede responder por el balance en bloques antiguos
+        try:
+            w3.eth.get_balance("0x" + "00" * 20, 1)
+            return True
+        except Exception:
+            return False
+
+    def process_range(self, w3, start_block, end_block, accumulators):
+        for _ in self.iter_range(w3, start_block, end_block, accumulators):
+            pass
+
+    def _state(self, w3: Web3, address: str, block_number: int) -> Tuple[int, int]:
+        """(nonce, balance) de la wallet al final del bloque; antes del génesis es (0, 0)."""
+        if block_number < 0:
+            return 0, 0
+        key = (address, block_number)
+        if key not in self._states:
+            self._states[key] = (
+                w3.eth.get_transaction_count(address, block_number),
+                w3.eth.get_balance(address, block_number)
+            )
+        return self._states[key]
+
+    def _joint_state(self, w3: Web3, addresses: List[str], block_number: int) -> Tuple:
+        """Estado de todas las wallets al final del bloque."""
+        return tuple(self._state(w3, address, block_number) for address in addresses)
+
+    @staticmethod
+    def _bisection_pays_off(before: Tuple, after: Tuple, size: int) -> bool:
+        """La bisección compensa si el nº de transacciones salientes por log2(N) es menor que N."""
+        nonce_delta = sum(a[0] - b[0] for b, a in zip(before, after))
+        return 2 * (nonce_delta + 1) * size.bit_length() < size
+
+    def iter_range(self, w3, start_block, end_block, accumulators, chunk_size=PROGRESS_CHUNK_SIZE):
+        self._timestamps, self._processed, self._states = {}, set(), {}
+        addresses = list(accumulators)
+        # las transferencias de tokens no cambian el nonce ni el balance de la wallet
+        self._process_token_logs(w3, start_block, end_block, accumulators)
+
+        reported = start_block - 1
+        # pila de subrangos (lo, hi]: el estado en lo es el previo y el de hi el final.
+        # Se resuelve primero el subrango más bajo, así todo lo anterior a hi queda procesado.
+        pending = [(start_block - 1, end_block)]
+        while pending:
+            lo, hi = pending.pop()
+            before = self._joint_state(w3, addresses, lo)
+            after = self._joint_state(w3, addresses, hi)
+            if before != after:
+                if hi - lo > 1 and self._bisection_pays_off(before, after, hi - lo):
+                    mid = (lo + hi) // 2
+                    pending.append((mid, hi))
+                    pending.append((lo, mid))
+                    continue
+                for b in range(lo + 1, hi + 1):
+                    analysis.process_block_for_wallets(w3, b, accumulators, include_logs=False)
+                    if b - reported >= chunk_size:
+                        reported = b
+                        yield b
+
+            # los subrangos pendientes empiezan en hi o después: el estado anterior ya no se consulta
+            self._states = {key: value for key, value in self._states.items() if key[1] >= hi}
+            if hi > reported and (hi - reported >= chunk_size or hi == end_block):
+                reported = hi
+                yield hi
+
+
+HISTORY_BACKENDS = {
+    backend.name: backend
+    for backend in (TraceFilterBackend, OtterscanBackend, StateBisectionBackend, BlockScanBackend)
+}
+
+# orden de detección con HISTORY_BACKEND=auto; la bisección es aproximada y solo se usa si se pide
+AUTO_HISTORY_BACKENDS = (TraceFilterBackend, OtterscanBackend, BlockScanBackend)
+
+# clase de backend detectada para cada nodo, para no repetir la detección en cada análisis
+_detected_backends: Dict[str, type] = {}
+
+
+def get_history_backend(w3: Web3) -> HistoryBackend:
+    """
+    Devuelve una instancia nueva del backend de historial para el nodo de `w3`.
+
+    Con HISTORY_BACKEND=auto se prueba cada backend en orden de preferencia y se
+    usa el primero que el nodo soporte; el escaneo de bloques es el último recurso.
+    La bisección de estado nunca se elige automáticamente.
+    Cada análisis recibe su propia instancia porque los backends guardan estado
+    durante el recorrido.
+    """
+    if HISTORY_BACKEND != "auto":
+        return HISTORY_BACKENDS[HISTORY_BACKEND]()
+
+    key = getattr(w3.provider, "endpoint_uri", None) or str(id(w3.provider))
+    if key not in _detected_backends:
+        for backend_class in AUTO_HISTORY_BACKENDS:
+            if backend_class().is_available(w3):
+                _detected_backends[key] = backend_class
+                break
+    return _detected_backends[key]()
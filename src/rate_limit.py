@@ -0,0 +1,472 @@
+# src/rate_limit.py
+import asyncio
+import functools
+import logging
+import random
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+import requests
+from web3 import AsyncHTTPProvider, HTTPProvider
+
+from src.config import (
+    RPC_MAX_RPS, RPC_MAX_CU_PER_SECOND, RPC_MAX_CONCURRENCY, RPC_LATENCY_TARGET,
+    RPC_MAX_RETRIES, RPC_BACKOFF_BASE, RPC_BACKOFF_MAX, RPC_ENDPOINT_BUDGETS, API_WORKERS
+)
+
+# Limitador de peticiones del lado del cliente, compartido por todas las conexiones del proceso
+# a un mismo endpoint (análisis, watchlist, precarga de la caché y la API asíncrona):
+#  - cubos de tokens de peticiones por segundo y de unidades de cómputo (CU) por segundo,
+#    con el coste de cada método de METHOD_COMPUTE_UNITS;
+#  - límite de peticiones en vuelo ajustado con AIMD: crece en una petición por cada ventana
+#    completa que termina bien, se reduce a la mitad ante un 429, un timeout o un error de
+#    límite del proveedor, y un 10% si la latencia supera RPC_LATENCY_TARGET;
+#  - reintentos con espera exponencial con jitter; si el proveedor envía Retry-After, todo
+#    el endpoint se detiene ese tiempo.
+# Así un 429 o un timeout se reintenta en vez de perder el bloque que se estaba leyendo.
+# Los envíos de transacciones solo se reintentan si el proveedor los rechazó sin procesarlos.
+
+logger = logging.getLogger(__name__)
+
+# Coste aproximado en CU de cada método, según las tablas de los proveedores más comunes
+METHOD_COMPUTE_UNITS = {
+    "eth_chainId": 0,
+    "net_version": 0,
+    "eth_blockNumber": 10,
+    "eth_getBlockByNumber": 16,
+    "eth_getTransactionByHash": 17,
+    "eth_getTransactionReceipt": 15,
+    "eth_getBalance": 19,
+    "eth_getCode": 19,
+    "eth_gasPrice": 19,
+    "eth_getTransactionCount": 26,
+    "eth_call": 26,
+    "eth_estimateGas": 87,
+    "eth_getLogs": 75,
+    "eth_sendRawTransaction": 250,
+    "trace_filter": 75,
+    "trace_transaction": 40,
+    "ots_searchTransactionsAfter": 75,
+    "ots_getTransactionBySenderAndNonce": 40,
+}
+DEFAULT_COMPUTE_UNITS = 20
+
+# respuestas HTTP que indican que el proveedor está limitando o saturado
+THROTTLE_STATUS = {429, 502, 503, 504}
+# de ellas, la única que garantiza que la petición no llegó al nodo
+REJECTED_STATUS = 429
+
+# métodos que no se pueden repetir a ciegas: tras un timeout o un corte de conexión no se sabe
+# si el nodo recibió la transacción, y reenviarla la duplicaría o fallaría con "already known"
+NON_IDEMPOTENT_METHODS = {"eth_sendRawTransaction", "eth_sendTransaction"}
+# textos de los errores JSON-RPC de límite de los proveedores (Infura, Alchemy, QuickNode...)
+RATE_LIMIT_MESSAGES = ("rate limit", "rate exceeded", "too many requests", "compute units", "request limit")
+
+# reducción de la concurrencia cuando la latencia supera el objetivo
+LATENCY_DECREASE = 0.9
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Segundos de la cabecera Retry-After, si la hay en forma numérica."""
+    try:
+        return float(headers.get("Retry-After"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+def classify_exception(error: Exception) -> Tuple[bool, Optional[float]]:
+    """Indica si un error de transporte merece reintento y cuánto pide esperar el proveedor."""
+    if isinstance(error, requests.HTTPError):
+        response = error.response
+        if response is not None and response.status_code in THROTTLE_STATUS:
+            return True, _retry_after(response.headers)
+        return False, None
+    if isinstance(error, aiohttp.ClientResponseError):
+        if error.status in THROTTLE_STATUS:
+            return True, _retry_after(error.headers)
+        return False, None
+    if isinstance(error, (requests.Timeout, requests.ConnectionError, asyncio.TimeoutError, aiohttp.ClientConnectionError)):
+        return True, None
+    return False, None
+
+
+def rejected_unprocessed(error: Exception) -> bool:
+    """Indica si el proveedor rechazó la petición con un 429, es decir, sin llegar a procesarla."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code == REJECTED_STATUS
+    if isinstance(error, aiohttp.ClientResponseError):
+        return error.status == REJECTED_STATUS
+    return False
+
+
+def is_rate_limit_error(error) -> bool:
+    """Indica si el error de una respuesta JSON-RPC es del límite de peticiones del proveedor."""
+    if not isinstance(error, dict):
+        return False
+    if error.get("code") == 429:
+        return True
+    message = str(error.get("message", "")).lower()
+    return any(text in message for text in RATE_LIMIT_MESSAGES)
+
+
+def is_throttled_response(response) -> bool:
+    """Indica si una respuesta (o alguna respuesta de un lote) es un error de límite."""
+    responses = response if isinstance(response, list) else [response]
+    return any(isinstance(r, dict) and is_rate_limit_error(r.get("error")) for r in responses)
+
+
+def is_fully_throttled_response(response) -> bool:
+    """Indica si todas las respuestas (de una petición o de un lote) son errores de límite."""
+    responses = response if isinstance(response, list) else [response]
+    return all(isinstance(r, dict) and is_rate_limit_error(r.get("error")) for r in responses)
+
+
+def _wake(waiter: asyncio.Future):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+def backoff_delay(attempt: int, retry_after: Optional[float] = None) -> float:
+    """Espera antes del reintento `attempt` (desde 0): Retry-After o exponencial con jitter completo."""
+    if retry_after is not None:
+        return retry_after + random.uniform(0, RPC_BACKOFF_BASE)
+    return random.uniform(0, min(RPC_BACKOFF_MAX, RPC_BACKOFF_BASE * 2 ** attempt))
+
+
+class _TokenBucket:
+    """Cubo de tokens que admite deuda: quien reserva sin saldo espera a que se reponga."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        # ráfagas de hasta un segundo de presupuesto
+        self.capacity = max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def reserve(self, amount: float, now: float) -> float:
+        """Descuenta `amount` tokens y devuelve los segundos que hay que esperar para usarlos."""
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= amount
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+
+class EndpointLimiter:
+    """Presupuesto de peticiones, CU y concurrencia de un endpoint RPC, seguro entre hilos."""
+
+    def __init__(
+        self,
+        endpoint: str,
+        rps: float = 0,
+        cu_per_second: float = 0,
+        max_concurrency: int = RPC_MAX_CONCURRENCY,
+        latency_target: float = RPC_LATENCY_TARGET,
+        cu_costs: Dict[str, int] = None
+    ):
+        self.endpoint = endpoint
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.latency_target = latency_target
+        self.cu_costs = {**METHOD_COMPUTE_UNITS, **(cu_costs or {})}
+        self.limit = float(self.max_concurrency)
+        self.in_flight = 0
+        self.paused_until = 0.0
+        self.latency = 0.0
+        self._decreased_at = 0.0
+        self._request_bucket = _TokenBucket(rps) if rps > 0 else None
+        self._cu_bucket = _TokenBucket(cu_per_second) if cu_per_second > 0 else None
+        self._slot_free = threading.Condition()
+        # esperas de `acquire_async`: (event loop, futuro) que `release` resuelve al liberar un hueco
+        self._async_waiters = []
+        self.counters = {"requests": 0, "throttled": 0, "retries": 0, "failures": 0}
+
+    def cost(self, method: str) -> int:
+        """Coste en CU de un método."""
+        return self.cu_costs.get(method, DEFAULT_COMPUTE_UNITS)
+
+    def _take_slot(self, cost: float) -> float:
+        """Ocupa un hueco de concurrencia (con el lock tomado) y devuelve la espera por presupuesto."""
+        self.in_flight += 1
+        now = time.monotonic()
+        wait = max(0.0, self.paused_until - now)
+        if self._request_bucket:
+            wait = max(wait, self._request_bucket.reserve(1, now))
+        if self._cu_bucket:
+            wait = max(wait, self._cu_bucket.reserve(cost, now))
+        return wait
+
+    def acquire(self, cost: float):
+        """Espera un hueco de concurrencia y el presupuesto de la petición."""
+        with self._slot_free:
+            while self.in_flight >= int(self.limit):
+                self._slot_free.wait()
+            wait = self._take_slot(cost)
+        if wait > 0:
+            try:
+                time.sleep(wait)
+            except BaseException:
+                self._release_slot()
+                raise
+
+    async def acquire_async(self, cost: float):
+        """Versión asíncrona de `acquire`: espera a que `release` la avise sin bloquear el event loop."""
+        loop = asyncio.get_running_loop()
+        while True:
+            with self._slot_free:
+                if self.in_flight < int(self.limit):
+                    wait = self._take_slot(cost)
+                    break
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+            # si se cancela aquí todavía no tiene hueco; los avisos despiertan a todas las esperas
+            await waiter
+        if wait > 0:
+            try:
+                await asyncio.sleep(wait)
+            except BaseException:
+                # cancelada mientras esperaba el presupuesto: el hueco ya estaba ocupado
+                self._release_slot()
+                raise
+
+    def _notify_async_waiters(self):
+        # con el lock tomado; las esperas pueden ser de otros event loops u otros hilos
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, waiter in waiters:
+            try:
+                loop.call_soon_threadsafe(_wake, waiter)
+            except RuntimeError:
+                # el event loop ya se cerró
+                pass
+
+    def release(self, latency: float, throttled: bool = False, retry_after: Optional[float] = None):
+        """Libera el hueco y ajusta el límite de concurrencia (AIMD) con el resultado de la petición."""
+        with self._slot_free:
+            self.in_flight -= 1
+            self.counters["requests"] += 1
+            self.latency = latency if not self.latency else 0.8 * self.latency + 0.2 * latency
+            now = time.monotonic()
+            if throttled:
+                self.counters["throttled"] += 1
+                if retry_after:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                self._decrease(0.5, now)
+            elif latency > self.latency_target:
+                self._decrease(LATENCY_DECREASE, now)
+            else:
+                self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+            self._slot_free.notify_all()
+            self._notify_async_waiters()
+
+    def _release_slot(self):
+        """Libera el hueco de una petición cancelada sin contarla ni ajustar el límite."""
+        with self._slot_free:
+            self.in_flight -= 1
+            self._slot_free.notify_all()
+            self._notify_async_waiters()
+
+    def _decrease(self, factor: float, now: float):
+        # una sola reducción por ventana: las peticiones que ya estaban en vuelo
+        # cuando empezó a limitar el proveedor no vuelven a reducir el límite
+        if now - self._decreased_at >= max(self.latency, 0.1):
+            self.limit = max(1.0, self.limit * factor)
+            self._decreased_at = now
+
+    def call(self, method: str, send, max_retries: int = RPC_MAX_RETRIES, cost: float = None, idempotent: bool = None):
+        """
+        Ejecuta `send()` dentro del presupuesto, reintentando los errores de límite y timeouts.
+
+        `cost` son las CU de la petición; por defecto, las de `method`. Si la petición no es
+        `idempotent` (por defecto, según NON_IDEMPOTENT_METHODS) solo se reintenta cuando el
+        proveedor la rechazó sin procesarla.
+        """
+        cost = self.cost(method) if cost is None else cost
+        idempotent = method not in NON_IDEMPOTENT_METHODS if idempotent is None else idempotent
+        for attempt in range(max_retries + 1):
+            self.acquire(cost)
+            start = time.monotonic()
+            try:
+                response = send()
+            except Exception as e:
+                retryable, retry_after = classify_exception(e)
+                self.release(time.monotonic() - start, retryable, retry_after)
+                if not retryable or attempt == max_retries:
+                    self._give_up(method, retryable, e)
+                    raise
+                if not idempotent and not rejected_unprocessed(e):
+                    self._not_resent(method, repr(e))
+                    raise
+                self._before_retry(method, attempt, e)
+                time.sleep(backoff_delay(attempt, retry_after))
+                continue
+            except BaseException:
+                # interrumpida (ej. KeyboardInterrupt): no es un límite del proveedor
+                self._release_slot()
+                raise
+
+            throttled = is_throttled_response(response)
+            self.release(time.monotonic() - start, throttled)
+            if not throttled or attempt == max_retries:
+                self._give_up(method, throttled, "límite de peticiones")
+                return response
+            if not idempotent and not is_fully_throttled_response(response):
+                # reenviar el lote repetiría las transacciones que sí se procesaron
+                self._not_resent(method, "un lote limitado solo en parte")
+                return response
+            self._before_retry(method, attempt, "límite de peticiones")
+            time.sleep(backoff_delay(attempt))
+
+    async def call_async(self, method: str, send, max_retries: int = RPC_MAX_RETRIES, cost: float = None, idempotent: bool = None):
+        """Versión asíncrona de `call`; `send()` devuelve una corrutina."""
+        cost = self.cost(method) if cost is None else cost
+        idempotent = method not in NON_IDEMPOTENT_METHODS if idempotent is None else idempotent
+        for attempt in range(max_retries + 1):
+            await self.acquire_async(cost)
+            start = time.monotonic()
+            try:
+                response = await send()
+            except Exception as e:
+                retryable, retry_after = classify_exception(e)
+                self.release(time.monotonic() - start, retryable, retry_after)
+                if not retryable or attempt == max_retries:
+                    self._give_up(method, retryable, e)
+                    raise
+                if not idempotent and not rejected_unprocessed(e):
+                    self._not_resent(method, repr(e))
+                    raise
+                self._before_retry(method, attempt, e)
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+                continue
+            except BaseException:
+                # petición cancelada (CancelledError no es Exception): se libera el hueco sin
+                # contarla como limitada, o el endpoint perdería ese hueco para siempre
+                self._release_slot()
+                raise
+
+            throttled = is_throttled_response(response)
+            self.release(time.monotonic() - start, throttled)
+            if not throttled or attempt == max_retries:
+                self._give_up(method, throttled, "límite de peticiones")
+                return response
+            if not idempotent and not is_fully_throttled_response(response):
+                # reenviar el lote repetiría las transacciones que sí se procesaron
+                self._not_resent(method, "un lote limitado solo en parte")
+                return response
+            self._before_retry(method, attempt, "límite de peticiones")
+            await asyncio.sleep(backoff_delay(attempt))
+
+    def _before_retry(self, method: str, attempt: int, reason):
+        with self._slot_free:
+            self.counters["retries"] += 1
+        logger.debug(f"{method} en {self.endpoint}: reintento {attempt + 1} tras {reason}")
+
+    def _not_resent(self, method: str, reason):
+        # envío de transacciones que no se repite porque el nodo pudo haberlo procesado
+        with self._slot_free:
+            self.counters["failures"] += 1
+        logger.warning(f"{method} en {self.endpoint}: no se reintenta tras {reason}, el nodo pudo haberlo procesado")
+
+    def _give_up(self, method: str, retryable: bool, reason):
+        # solo cuenta como fallo si se agotaron los reintentos de un error reintentable
+        if not retryable:
+            return
+        with self._slot_free:
+            self.counters["failures"] += 1
+        logger.warning(f"{method} en {self.endpoint}: reintentos agotados ({reason})")
+
+    def status(self) -> Dict:
+        """Estado del limitador, expuesto en /ready."""
+        with self._slot_free:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "in_flight": self.in_flight,
+                "latency_ms": round(self.latency * 1000, 1),
+                **self.counters,
+            }
+
+
+_limiters: Dict[str, EndpointLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def endpoint_budget(endpoint: str, workers: int = API_WORKERS) -> Dict:
+    """
+    Presupuesto de un endpoint en este proceso: el de RPC_ENDPOINT_BUDGETS con el prefijo más
+    largo, o el global, repartido entre los `workers` procesos de la API. Cada proceso tiene su
+    propio limitador, así que sin repartirlo el proveedor recibiría `workers` veces el presupuesto.
+    """
+    budget = {"rps": RPC_MAX_RPS, "cu_per_second": RPC_MAX_CU_PER_SECOND, "max_concurrency": RPC_MAX_CONCURRENCY}
+    prefixes = [prefix for prefix in RPC_ENDPOINT_BUDGETS if endpoint.startswith(prefix)]
+    if prefixes:
+        budget.update(RPC_ENDPOINT_BUDGETS[max(prefixes, key=len)])
+    workers = max(1, workers)
+    budget["rps"] = budget["rps"] / workers
+    budget["cu_per_second"] = budget["cu_per_second"] / workers
+    budget["max_concurrency"] = max(1, budget["max_concurrency"] // workers)
+    return budget
+
+
+def get_limiter(endpoint: str) -> EndpointLimiter:
+    """Limitador compartido del endpoint, creado con su presupuesto la primera vez."""
+    with _limiters_lock:
+        if endpoint not in _limiters:
+            _limiters[endpoint] = EndpointLimiter(endpoint, **endpoint_budget(endpoint))
+        return _limiters[endpoint]
+
+
+def limiter_status() -> Dict[str, Dict]:
+    """Estado de los limitadores de todos los endpoints usados por el proceso."""
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.endpoint: limiter.status() for limiter in limiters}
+
+
+def _batch_cost(limiter: EndpointLimiter, batch_requests) -> int:
+    """Un lote consume las CU de todas sus peticiones."""
+    return sum(limiter.cost(method) for method, _ in batch_requests)
+
+
+def _batch_idempotent(batch_requests) -> bool:
+    """Un lote se puede repetir a ciegas si ninguna de sus peticiones envía una transacción."""
+    return all(method not in NON_IDEMPOTENT_METHODS for method, _ in batch_requests)
+
+
+class RateLimitedHTTPProvider(HTTPProvider):
+    """HTTPProvider cuyas peticiones pasan por el limitador compartido de su endpoint."""
+
+    def __init__(self, endpoint_uri=None, max_retries: int = RPC_MAX_RETRIES, **kwargs):
+        # los reintentos los gestiona el limitador; los de web3 se desactivan para no duplicarlos
+        kwargs.setdefault("exception_retry_configuration", None)
+        super().__init__(endpoint_uri, **kwargs)
+        self.limiter = get_limiter(str(self.endpoint_uri))
+        self.max_retries = max_retries
+
+    def make_request(self, method, params):
+        send = functools.partial(super().make_request, method, params)
+        return self.limiter.call(method, send, self.max_retries)
+
+    def make_batch_request(self, batch_requests):
+        send = functools.partial(super().make_batch_request, batch_requests)
+        return self.limiter.call(
+            "batch", send, self.max_retries, _batch_cost(self.limiter, batch_requests), _batch_idempotent(batch_requests)
+        )
+
+
+class RateLimitedAsyncHTTPProvider(AsyncHTTPProvider):
+    """Versión asíncrona de `RateLimitedHTTPProvider`, con el mismo limitador por endpoint."""
+
+    def __init__(self, endpoint_uri=None, max_retries: int = RPC_MAX_RETRIES, **kwargs):
+        kwargs.setdefault("exception_retry_configuration", None)
+        super().__init__(endpoint_uri, **kwargs)
+        self.limiter = get_limiter(str(self.endpoint_uri))
+        self.max_retries = max_retries
+
+    async def make_request(self, method, params):
+        send = functools.partial(super().make_request, method, params)
+        return await self.limiter.call_async(method, send, self.max_retries)
+
+    async def make_batch_request(self, batch_requests):
+        send = functools.partial(super().make_batch_request, batch_requests)
+        return await self.limiter.call_async(
+            "batch", send, self.max_retries, _batch_cost(self.limiter, batch_requests), _batch_idempotent(batch_requests)
+        )
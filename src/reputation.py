@@ -75,4 +75,38 @@ def calculate_reputation(
         weights['w_FA'] * fa_n
     )
 
-    return round(reputation_score, 2), normalized_metrics
\ No newline at end of file
+    return round(reputation_score, 2), normalized_metrics
+
+
+def reputation_from_metrics(
+    metrics: typing.Dict[str, int],
+    now_timestamp: int,
+    weights: typing.Dict[str, float] = P2P_MARKET_WEIGHTS,
+    window_days: typing.Optional[int] = None
+) -> typing.Tuple[float, typing.Dict[str, float]]:
+    """
+    Calcula la reputación a partir de las métricas del análisis de una wallet.
+
+    Args:
+        metrics (dict): Métricas de la wallet, con las claves de METRIC_KEYS_ORDER.
+        now_timestamp (int): Timestamp de referencia para la longevidad (ej. el del último bloque).
+        weights (dict): Pesos de cada métrica, como en `calculate_reputation`.
+        window_days (int, opcional): Si se indica, `metrics` son las de los últimos
+                        `window_days` días (ver `analysis.windowed_metrics`) y la
+                        longevidad se limita a la ventana.
+
+    Returns:
+        tuple: La puntuación final y las métricas normalizadas, como `calculate_reputation`.
+    """
+    # Convertir el timestamp a días de longevidad
+    longevity_days = max(0, now_timestamp - metrics['firstTxTimestamp']) // (24 * 3600)
+    if window_days is not None:
+        longevity_days = min(longevity_days, window_days)
+
+    return calculate_reputation(
+        longevity_days=longevity_days,
+        successful_txs=metrics['txIn'] + metrics['txOut'],
+        failed_txs=metrics['failedTxs'],
+        active_days=metrics['activeDaysCount'],
+        weights=weights
+    )
\ No newline at end of file
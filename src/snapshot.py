@@ -0,0 +1,159 @@
+# src/snapshot.py
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src import reputation
+from src.analysis import DAILY_METRIC_KEYS
+from src.cache import WalletCache, wallet_cache
+from src.config import METRIC_KEYS_ORDER, SNAPSHOT_CHUNK_SIZE
+
+# pyarrow es opcional: solo hace falta para exportar o importar snapshots
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+# Snapshots en Parquet de las métricas de todas las wallets conocidas: una fila por wallet
+# con sus métricas, el último bloque analizado, la reputación y el histograma diario. Se escriben por grupos de
+# filas de SNAPSHOT_CHUNK_SIZE wallets, sin construir la tabla completa en memoria, y se
+# importan por lotes en la caché en memoria, que el análisis consulta antes de escanear.
+
+logger = logging.getLogger(__name__)
+
+# gasUsed y feePaid (en wei) no caben en un int64
+WIDE_METRICS = {"gasUsed", "feePaid"}
+NORMALIZED_COLUMNS = {
+    "Longevidad (L_n)": "score_longevity",
+    "Volumen (V_n)": "score_volume",
+    "Fiabilidad (F_n)": "score_reliability",
+    "Frecuencia Actividad (FA_n)": "score_activity",
+}
+
+
+def _require_pyarrow():
+    if pa is None:
+        raise RuntimeError("Los snapshots necesitan pyarrow: pip install pyarrow")
+
+
+def snapshot_schema(metadata: Dict[str, str] = None):
+    """Esquema de columnas del snapshot."""
+    _require_pyarrow()
+    fields = [pa.field("wallet", pa.string()), pa.field("last_block", pa.int64())]
+    fields += [
+        pa.field(key, pa.decimal128(38, 0) if key in WIDE_METRICS else pa.int64())
+        for key in METRIC_KEYS_ORDER
+    ]
+    fields.append(pa.field("reputation_score", pa.float64()))
+    fields += [pa.field(column, pa.float64()) for column in NORMALIZED_COLUMNS.values()]
+    # histograma diario (ver `WalletCache`): una entrada por día, nulo si la wallet no tiene
+    day_fields = [pa.field("day", pa.string())] + [
+        pa.field(key, pa.decimal128(38, 0) if key in WIDE_METRICS else pa.int64())
+        for key in DAILY_METRIC_KEYS
+    ]
+    fields += [
+        pa.field("daily", pa.list_(pa.struct(day_fields))),
+        pa.field("daily_since", pa.string()),
+        pa.field("daily_last_block", pa.int64()),
+    ]
+    return pa.schema(fields, metadata=metadata)
+
+
+def _chunk_to_batch(schema, rows: List[Tuple[str, Dict, int, Optional[Tuple]]], now_timestamp: int):
+    """Convierte un grupo de wallets (wallet, métricas, último bloque, histograma) en un RecordBatch."""
+    columns = {field.name: [] for field in schema}
+    for wallet, metrics, last_block, daily in rows:
+        columns["wallet"].append(wallet)
+        columns["last_block"].append(last_block)
+        for key in METRIC_KEYS_ORDER:
+            columns[key].append(metrics.get(key, 0))
+
+        # sin primera transacción no hay longevidad con la que puntuar
+        if metrics.get("firstTxTimestamp"):
+            score, normalized = reputation.reputation_from_metrics(metrics, now_timestamp)
+        else:
+            score, normalized = None, {}
+        columns["reputation_score"].append(score)
+        for name, column in NORMALIZED_COLUMNS.items():
+            columns[column].append(normalized.get(name))
+
+        days, since, daily_last_block = daily or (None, None, None)
+        columns["daily"].append(None if days is None else [
+            {"day": day, **dict(zip(DAILY_METRIC_KEYS, row))} for day, row in sorted(days.items())
+        ])
+        columns["daily_since"].append(since)
+        columns["daily_last_block"].append(daily_last_block)
+
+    return pa.record_batch([pa.array(columns[field.name], type=field.type) for field in schema], schema=schema)
+
+
+def iter_cached_wallets(cache: WalletCache = wallet_cache) -> Iterator[Tuple[str, Dict, int, Optional[Tuple]]]:
+    """
+    Recorre las wallets de la caché en memoria como (wallet, métricas, último bloque, histograma),
+    donde el histograma es (días, desde, último bloque) o None si la wallet no tiene.
+    """
+    for wallet in cache.wallets():
+        metrics, last_block = cache.get(wallet)
+        if metrics:
+            days, since, daily_last_block = cache.get_daily(wallet)
+            yield wallet, metrics, last_block, None if days is None else (days, since, daily_last_block)
+
+
+def export_snapshot(
+    path: str,
+    wallets: Iterable[Tuple[str, Dict, int, Optional[Tuple]]],
+    now_timestamp: int,
+    head_block: int,
+    chunk_size: int = SNAPSHOT_CHUNK_SIZE
+) -> int:
+    """
+    Escribe un snapshot Parquet de `wallets` y devuelve cuántas filas se escribieron.
+
+    La reputación se calcula a fecha de `now_timestamp`; ese momento y `head_block`
+    quedan en los metadatos del archivo.
+    """
+    schema = snapshot_schema({"scored_at": str(now_timestamp), "head_block": str(head_block)})
+    written = 0
+    rows = []
+    with pq.ParquetWriter(path, schema) as writer:
+        for row in wallets:
+            rows.append(row)
+            if len(rows) >= chunk_size:
+                writer.write_batch(_chunk_to_batch(schema, rows, now_timestamp))
+                written += len(rows)
+                rows = []
+        if rows:
+            writer.write_batch(_chunk_to_batch(schema, rows, now_timestamp))
+            written += len(rows)
+
+    logger.info(f"Snapshot con {written} wallets escrito en {path}.")
+    return written
+
+
+def import_snapshot(path: str, cache: WalletCache = wallet_cache, batch_size: int = SNAPSHOT_CHUNK_SIZE) -> int:
+    """
+    Carga en la caché en memoria las métricas, el último bloque y el histograma diario de un snapshot.
+
+    Lee el archivo por lotes. Las wallets con datos más recientes en la caché no se
+    sobrescriben. Los snapshots anteriores sin histograma también se pueden importar.
+    Devuelve cuántas wallets se leyeron.
+    """
+    _require_pyarrow()
+    parquet_file = pq.ParquetFile(path)
+    columns = ["wallet", "last_block"] + METRIC_KEYS_ORDER
+    with_daily = "daily" in parquet_file.schema_arrow.names
+    if with_daily:
+        columns += ["daily", "daily_since", "daily_last_block"]
+    imported = 0
+    for batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        data = batch.to_pydict()
+        for i, wallet in enumerate(data["wallet"]):
+            metrics = {key: int(data[key][i]) for key in METRIC_KEYS_ORDER}
+            cache.set(wallet, metrics, data["last_block"][i])
+            if with_daily and data["daily"][i] is not None:
+                days = {entry["day"]: [int(entry[key]) for key in DAILY_METRIC_KEYS] for entry in data["daily"][i]}
+                cache.restore_daily(wallet, days, data["daily_since"][i], data["daily_last_block"][i])
+        imported += batch.num_rows
+
+    logger.info(f"Snapshot {path} importado: {imported} wallets.")
+    return imported
@@ -87,63 +87,63 @@ def display_analysis_tab(localS):
 
 def perform_analysis(wallet_address, localS):
     """Llama a la lógica central y gestiona el estado y la UI de Streamlit."""
-    with st.spinner("Analizando y actualizando... Este proceso puede tardar."):
-        try:
-            w3 = st.session_state.w3
-            contract = st.session_state.contract
-            checksum_wallet_address = w3.to_checksum_address(wallet_address)
-            
-            # app_config = st.session_state.app_config
-            owner_address = st.session_state.app_config.get("owner_address", "0x00000000000000000000000000000000000000000")
-            owner_pk = OWNER_PRIVATE_KEY 
-
-            # 1. Obtener las métricas crudas desde el módulo de análisis
-            final_metrics, end_block = analysis.run_full_analysis_and_update(
-                w3, contract, checksum_wallet_address, owner_address, owner_pk
-            )
-            
-            first_date = final_metrics.get('firstTxTimestamp', 0)
-            if first_date == 0:
-                st.error("No se encontraron transacciones para esta wallet.")
-                # st.rerun()
-                return
-            
-            last_date = w3.eth.get_block(w3.eth.block_number).timestamp
-            
-            # Convertir el timestamp a días de longevidad
-            longevity_days = (last_date - first_date) // (24 * 3600) 
-            
-            successful_txs = final_metrics['txIn'] + final_metrics['txOut']
-            
-            # 2. Llamar a la función del módulo de reputación
-            reputation_score, normalized_metrics = reputation.calculate_reputation(
-                longevity_days=longevity_days,
-                successful_txs=successful_txs,
-                failed_txs=final_metrics['failedTxs'],
-                active_days=final_metrics['activeDaysCount']
-            )
-            
-            st.success("Proceso completado.")
-            if owner_pk:
-                st.info("La actualización del contrato ha sido enviada.")
+    progress_bar = st.progress(0.0, text="Analizando y actualizando...")
+    try:
+        w3 = st.session_state.w3
+        contract = st.session_state.contract
+        checksum_wallet_address = w3.to_checksum_address(wallet_address)
+        
+        # app_config = st.session_state.app_config
+        owner_address = st.session_state.app_config.get("owner_address", "0x00000000000000000000000000000000000000000")
+        owner_pk = OWNER_PRIVATE_KEY 
+
+        # 1. Obtener las métricas crudas desde el módulo de análisis, mostrando el progreso por tramos
+        final_metrics, end_block = {}, 0
+        for event in analysis.iter_full_analysis_and_update(
+            w3, contract, checksum_wallet_address, owner_address, owner_pk
+        ):
+            if event["type"] == "progress":
+                progress_bar.progress(
+                    event["processed_blocks"] / event["total_blocks"],
+                    text=f"Procesando bloques... {event['processed_blocks']}/{event['total_blocks']} "
+                         f"(txs encontradas: {event['metrics']['totalTxs']})"
+                )
             else:
-                st.warning("Análisis completado, pero el contrato no se actualizó (clave privada no configurada).")
-
-            result_to_save = {
-                "wallet": checksum_wallet_address,
-                "metrics": final_metrics,
-                "reputation_score": reputation_score,      
-                "normalized_metrics": normalized_metrics 
-            }
-            
-            localS.setItem("analysis_result", result_to_save)
-            st.session_state.analysis_result = result_to_save
-            
-            show_results() 
-            # st.rerun()   
-                        
-        except Exception as e:
-            st.error(f"Ha ocurrido un error durante el proceso: {e}", icon="🚨")
+                final_metrics, end_block = event["metrics"], event["last_block"]
+        progress_bar.progress(1.0, text="Análisis completado.")
+        
+        first_date = final_metrics.get('firstTxTimestamp', 0)
+        if first_date == 0:
+            st.error("No se encontraron transacciones para esta wallet.")
+            # st.rerun()
+            return
+        
+        last_date = w3.eth.get_block(w3.eth.block_number).timestamp
+        
+        # 2. Llamar a la función del módulo de reputación
+        reputation_score, normalized_metrics = reputation.reputation_from_metrics(final_metrics, last_date)
+        
+        st.success("Proceso completado.")
+        if owner_pk:
+            st.info("La actualización del contrato ha sido enviada.")
+        else:
+            st.warning("Análisis completado, pero el contrato no se actualizó (clave privada no configurada).")
+
+        result_to_save = {
+            "wallet": checksum_wallet_address,
+            "metrics": final_metrics,
+            "reputation_score": reputation_score,      
+            "normalized_metrics": normalized_metrics 
+        }
+        
+        localS.setItem("analysis_result", result_to_save)
+        st.session_state.analysis_result = result_to_save
+        
+        show_results() 
+        # st.rerun()   
+                    
+    except Exception as e:
+        st.error(f"Ha ocurrido un error durante el proceso: {e}", icon="🚨")
 
 def show_results():
     """Muestra los resultados del análisis si están disponibles."""
@@ -0,0 +1,194 @@
+# src/watchlist.py
+import logging
+import threading
+from typing import Dict, List
+from web3 import Web3
+
+from src import analysis
+from src.cache import WalletCache, wallet_cache
+from src.config import METRIC_KEYS_ORDER, WATCHLIST_POLL_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+DISTINCT_COUNT_KEYS = {
+    "contracts_created": "contractsCreatedCount",
+    "seen_erc20": "distinctErc20Count",
+    "seen_nfts": "distinctNftCount",
+    "active_days": "activeDaysCount",
+}
+
+
+class Watchlist:
+    """
+    Sigue la cabeza de la cadena para un conjunto de wallets y mantiene sus métricas al día.
+
+    Un hilo en segundo plano consulta periódicamente el último bloque y procesa
+    cada bloque nuevo una única vez para todas las wallets vigiladas, sumando
+    el resultado a la caché en memoria. Así, las lecturas de una wallet vigilada
+    no necesitan escanear nada en el momento de la petición.
+    """
+
+    def __init__(self, cache: WalletCache = wallet_cache, poll_interval: float = WATCHLIST_POLL_INTERVAL):
+        self.cache = cache
+        self.poll_interval = poll_interval
+        self.w3 = None
+        self.contract = None
+        # wallets listas para seguir la cabeza -> conjuntos de elementos distintos vistos en la sesión
+        self._watched: Dict[str, Dict] = {}
+        # wallets añadidas que aún no se han puesto al día con un análisis completo
+        self._pending: List[str] = []
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, w3: Web3, contract):
+        """Inicia el hilo de seguimiento (si no estaba iniciado) con la conexión dada."""
+        self.w3 = w3
+        self.contract = contract
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name="watchlist")
+        self._thread.start()
+
+    def stop(self):
+        """Detiene el hilo de seguimiento."""
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=self.poll_interval * 2)
+
+    def add(self, wallet_address: str):
+        """Añade una wallet; se pondrá al día en la próxima iteración del hilo."""
+        with self._lock:
+            if wallet_address not in self._watched and wallet_address not in self._pending:
+                self._pending.append(wallet_address)
+
+    def remove(self, wallet_address: str) -> bool:
+        """Deja de vigilar la wallet. Devuelve False si no estaba en la watchlist."""
+        with self._lock:
+            if wallet_address in self._pending:
+                self._pending.remove(wallet_address)
+                return True
+            return self._watched.pop(wallet_address, None) is not None
+
+    def is_ready(self, wallet_address: str) -> bool:
+        """Indica si la wallet está vigilada y sus métricas en caché siguen la cabeza."""
+        with self._lock:
+            return wallet_address in self._watched
+
+    def status(self) -> List[Dict]:
+        """Estado de cada wallet de la watchlist, con el último bloque incorporado."""
+        with self._lock:
+            ready, pending = list(self._watched), list(self._pending)
+        return (
+            [{"wallet_address": w, "ready": True, "last_block": self.cache.get(w)[1]} for w in ready] +
+            [{"wallet_address": w, "ready": False, "last_block": None} for w in pending]
+        )
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self._catch_up_pending()
+                self._follow_head()
+            except Exception as e:
+                logger.error(f"Error en el seguimiento de la watchlist: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def _catch_up_pending(self):
+        """Ejecuta el análisis completo de las wallets recién añadidas hasta la cabeza actual."""
+        with self._lock:
+            pending = list(self._pending)
+
+        for wallet_address in pending:
+            # los elementos distintos ya contados por el análisis inicial no deben volver a contarse:
+            # se parte de sus conjuntos y de los días del histograma diario en caché
+            sets = analysis.new_accumulators()[1]
+            metrics, last_block = analysis.run_full_analysis_and_update(
+                self.w3, self.contract, wallet_address, sets=sets
+            )
+            if last_block == 0:
+                # sin transacciones salientes todavía no hay métricas: fijar la cabeza actual en la caché
+                # haría que nunca se contasen las entrantes anteriores. Se reintenta en la próxima consulta.
+                continue
+            self.cache.set(wallet_address, metrics, last_block)
+            daily, _, _ = self.cache.get_daily(wallet_address)
+            sets["active_days"].update(daily or {})
+
+            with self._lock:
+                if wallet_address in self._pending:
+                    self._pending.remove(wallet_address)
+                    self._watched[wallet_address] = sets
+
+    def _follow_head(self):
+        """Procesa una sola vez cada bloque nuevo para todas las wallets vigiladas."""
+        with self._lock:
+            watched = dict(self._watched)
+        if not watched:
+            return
+
+        head = self.w3.eth.block_number
+        last_blocks = {w: self.cache.get(w)[1] for w in watched}
+        start_block = min(last_blocks.values()) + 1
+        if start_block > head:
+            return
+
+        # los conjuntos de elementos distintos se conservan entre consultas; el histograma diario
+        # solo acumula los bloques de esta consulta y se suma después al de la caché
+        for sets in watched.values():
+            sets["daily"] = {}
+        accumulators = {w: ({key: 0 for key in METRIC_KEYS_ORDER}, sets) for w, sets in watched.items()}
+        distinct_before = {
+            w: {key: len(sets[key]) for key in DISTINCT_COUNT_KEYS} for w, sets in watched.items()
+        }
+
+        processed_up_to = start_block - 1
+        for b in range(start_block, head + 1):
+            if self._stop.is_set():
+                break
+            active = {w: acc for w, acc in accumulators.items() if last_blocks[w] < b}
+            try:
+                analysis.process_block_for_wallets(self.w3, b, active)
+            except Exception as e:
+                # se reintenta desde este bloque en la próxima consulta
+                logger.warning(f"No se pudo procesar el bloque {b} para la watchlist: {e}")
+                break
+            processed_up_to = b
+
+        moved = []
+        for wallet_address, (stats, sets) in accumulators.items():
+            if processed_up_to <= last_blocks[wallet_address]:
+                continue
+            # si otro análisis (streaming, Streamlit) avanzó la caché durante la consulta, sus
+            # totales ya incluyen parte de estos bloques: no se suman y la wallet se vuelve a poner al día
+            metrics, cached_block = self.cache.get(wallet_address)
+            if metrics is None or cached_block != last_blocks[wallet_address]:
+                moved.append(wallet_address)
+                continue
+            for key in METRIC_KEYS_ORDER:
+                if key == "firstTxTimestamp": continue
+                metrics[key] += stats[key]
+            for set_name, key in DISTINCT_COUNT_KEYS.items():
+                metrics[key] += len(sets[set_name]) - distinct_before[wallet_address][set_name]
+            if metrics.get("firstTxTimestamp", 0) == 0 and stats["txOut"] > 0:
+                _, metrics["firstTxTimestamp"] = analysis.get_first_tx_timestamp(self.w3, wallet_address)
+            if not self.cache.replace(wallet_address, metrics, processed_up_to, last_blocks[wallet_address]):
+                moved.append(wallet_address)
+                continue
+            analysis.store_daily_histogram(
+                self.w3, wallet_address, sets["daily"], last_blocks[wallet_address] + 1, processed_up_to, self.cache
+            )
+
+        if moved:
+            self._requeue(moved)
+
+    def _requeue(self, wallets: List[str]):
+        """Devuelve las wallets a pendientes para volver a sembrar sus conjuntos con un análisis nuevo."""
+        logger.info(f"La caché de {wallets} cambió durante la consulta de la watchlist; se vuelven a poner al día.")
+        with self._lock:
+            for wallet_address in wallets:
+                if self._watched.pop(wallet_address, None) is not None and wallet_address not in self._pending:
+                    self._pending.append(wallet_address)
+
+
+# instancia compartida por la API
+watchlist = Watchlist()